@@ -1,9 +1,5 @@
 import numpy as np
-import copy
-import sys
-
-sys.setrecursionlimit(10 ** 6)
-
+from . import kernels
 
 
 """
@@ -35,15 +31,114 @@ NOTES:
     f = exp_ad(x)
     print(f.val, f.der)
 
+    #Examples for higher order derivatives, the Taylor coefficients are carried up to the order
+    x = AutoDiffTaylor(0.5, order=10)
+    f = exp_ad(x) * sin_ad(x)
+    print(f.coef, f.derivatives())
+
 """
 
+class SparseTangent():
+    """
+    A sparse derivative vector for AutoDiffVector. Only the entries an intermediate actually
+    depends on are stored, as a dict mapping the input index to the derivative value.
+    Created by gen_vars(..., sparse=True).
+    """
+    # Make numpy scalars and arrays hand their binary operators over to this class
+    __array_ufunc__ = None
+    __slots__ = ('entries', 'size')
+
+    def __init__(self, entries, size):
+        """
+        SparseTangent class constructor.
+        :param entries: a dict mapping input indices to derivative values
+        :param size: the number of inputs, i.e. the length of the dense derivative vector
+        """
+        self.entries = entries
+        self.size = size
+
+    def __repr__(self):
+        return f'SparseTangent({self.entries}, size={self.size})'
+
+    def toarray(self):
+        """
+        Returns the dense derivative vector as a numpy array
+        """
+        shape = np.shape(next(iter(self.entries.values()))) if self.entries else ()
+        dense = np.zeros(shape + (self.size,))
+        for idx, value in self.entries.items():
+            dense[..., idx] = value
+        return dense
+
+    def __add__(self, other):
+        if not isinstance(other, SparseTangent):
+            return self.toarray() + other
+        # merge the smaller dict into a copy of the larger one
+        big, small = (self, other) if len(self.entries) >= len(other.entries) else (other, self)
+        entries = dict(big.entries)
+        for idx, value in small.entries.items():
+            entries[idx] = entries[idx] + value if idx in entries else value
+        return SparseTangent(entries, self.size)
+
+    def __radd__(self, other):
+        return self.__add__(other)
+
+    def __neg__(self):
+        return SparseTangent({idx: -value for idx, value in self.entries.items()}, self.size)
+
+    def __sub__(self, other):
+        return self + (-other)
+
+    def __rsub__(self, other):
+        return -self + other
+
+    def __mul__(self, other):
+        if isinstance(other, SparseTangent):
+            raise TypeError('Cannot multiply two derivative vectors')
+        return SparseTangent({idx: value * other for idx, value in self.entries.items()}, self.size)
+
+    def __rmul__(self, other):
+        return self.__mul__(other)
+
+    def __truediv__(self, other):
+        return SparseTangent({idx: value / other for idx, value in self.entries.items()}, self.size)
+
+
+def _dense(der):
+    """
+    Returns a derivative as a numpy array, whether it is stored sparse or dense
+    """
+    return der.toarray() if isinstance(der, SparseTangent) else der
+
+
+def _sum_ders(terms):
+    """
+    Sums a list of derivatives. Sparse ones are merged into a single dict instead of copying
+    the running sum at every step
+    """
+    if all(isinstance(tt, SparseTangent) for tt in terms):
+        entries = {}
+        for tt in terms:
+            for idx, value in tt.entries.items():
+                entries[idx] = entries[idx] + value if idx in entries else value
+        return SparseTangent(entries, terms[0].size)
+    der = terms[0]
+    for tt in terms[1:]:
+        der = der + tt
+    return der
+
+
 class AutoDiffVector():
     """
     A class for forward mode automatic differentiation variable.
     """
+    # no per-instance __dict__, every operation creates a new instance
+    __slots__ = ('val', 'der')
+
     def __init__(self, a, der=1):
         """
-        AutoDiffVector class constructor. A single nominal value is supported as val.
+        AutoDiffVector class constructor. A single nominal value is supported as val,
+        or a (B, 1) column of values for a batch of points (see gen_batch_vars).
         If no value given for "der", then the default
         is "1"
         :param a:
@@ -58,10 +153,18 @@ class AutoDiffVector():
         vectorize the output of the function from Rm to Rn
         ---------------
         v: a list of AutoDiffVector instances
+        ---------------
+        return: an AutoDiffVector with values of shape (m, 1) and derivatives of shape (m, n). For batched outputs
+                (built from gen_batch_vars over B points) the values have shape (m, B) and the derivatives (m, B, n)
         """
+        if any(np.ndim(ii.val) == 2 for ii in v):
+            batch = max(len(ii.val) for ii in v if np.ndim(ii.val) == 2)
+            nvars = max(np.shape(ii.der)[-1] for ii in v if np.ndim(ii.val) == 2)
+            return AutoDiffVector(np.array([np.broadcast_to(np.reshape(ii.val, -1), batch) for ii in v]),
+                                  np.array([np.broadcast_to(_dense(ii.der), (batch, nvars)) for ii in v]))
         vvector=np.array([ii.val for ii in v])
         vvector=vvector.reshape(len(vvector),1)
-        return AutoDiffVector(vvector, np.array([ii.der for ii in v]))
+        return AutoDiffVector(vvector, np.array([_dense(ii.der) for ii in v]))
 
     def __add__(self, other):
         """
@@ -72,13 +175,10 @@ class AutoDiffVector():
         output: A new AutoDiffVector instance
         """
          
-        new = copy.deepcopy(self)
         try:
-            new.val += other.val
-            new.der += other.der
+            return AutoDiffVector(self.val + other.val, self.der + other.der)
         except AttributeError:
-            new.val += other
-        return new
+            return AutoDiffVector(self.val + other, self.der)
 
     def __radd__(self, other):
         return self.__add__(other)
@@ -91,14 +191,10 @@ class AutoDiffVector():
         ------------
         output: A new AutoDiffVector instance
         """
-        new = copy.deepcopy(self)
         try:
-            new.val *= other.val
-            new.der = self.der * other.val + self.val * other.der
+            return AutoDiffVector(self.val * other.val, self.der * other.val + self.val * other.der)
         except AttributeError:
-            new.val *= other
-            new.der *= other
-        return new
+            return AutoDiffVector(self.val * other, self.der * other)
 
     def __rmul__(self, other):
         return self.__mul__(other)
@@ -111,14 +207,11 @@ class AutoDiffVector():
         ------------
         output: A new AutoDiffVector instance
         """
-        new = copy.deepcopy(self)
         try:
-            new.val = self.val / other.val
-            new.der = self.der / other.val - self.val / np.power(other.val, 2.) * other.der
+            return AutoDiffVector(self.val / other.val,
+                                  self.der / other.val - self.val / np.power(other.val, 2.) * other.der)
         except AttributeError:
-            new.val = self.val / other
-            new.der = self.der / other
-        return new
+            return AutoDiffVector(self.val / other, self.der / other)
 
     def __rtruediv__(self, other):
         """
@@ -128,14 +221,11 @@ class AutoDiffVector():
         ------------
         output: A new AutoDiffVector instance
         """
-        new = copy.deepcopy(self)
         try:
-            new.val = other.val / self.val
-            new.der = other.der / self.val - other.val / np.power(self.val, 2.) * self.der
+            return AutoDiffVector(other.val / self.val,
+                                  other.der / self.val - other.val / np.power(self.val, 2.) * self.der)
         except AttributeError:
-            new.val = other / self.val
-            new.der = -other / np.power(self.val, 2.) * self.der
-        return new
+            return AutoDiffVector(other / self.val, -other / np.power(self.val, 2.) * self.der)
 
     def __neg__(self):
         """
@@ -145,10 +235,7 @@ class AutoDiffVector():
         ------------
         output: A new AutoDiffVector instance
         """
-        new = copy.deepcopy(self)
-        new.val = -new.val
-        new.der = -new.der
-        return new
+        return AutoDiffVector(-self.val, -self.der)
 
     def __sub__(self, other):
         """
@@ -158,13 +245,10 @@ class AutoDiffVector():
         ------------
         output: A new AutoDiffVector instance
         """
-        new = copy.deepcopy(self)
         try:
-            new.val -= other.val
-            new.der -= other.der
+            return AutoDiffVector(self.val - other.val, self.der - other.der)
         except AttributeError:
-            new.val -= other
-        return new
+            return AutoDiffVector(self.val - other, self.der)
 
     def __rsub__(self, other):
         """
@@ -184,14 +268,12 @@ class AutoDiffVector():
         ------------
         output: A new AutoDiffVector instance
         """
-        new = copy.deepcopy(self)
         try:
-            new.val = np.power(self.val, other.val)
-            new.der = other.val * np.power(self.val, other.val - 1) * self.der + new.val * np.log(self.val) * other.der
+            val = np.power(self.val, other.val)
+            return AutoDiffVector(val, other.val * np.power(self.val, other.val - 1) * self.der
+                                  + val * np.log(self.val) * other.der)
         except AttributeError:
-            new.val = np.power(self.val, other)
-            new.der = other * np.power(self.val, other - 1) * self.der
-        return new
+            return AutoDiffVector(np.power(self.val, other), other * np.power(self.val, other - 1) * self.der)
 
     def __rpow__(self, other):
         """
@@ -201,14 +283,13 @@ class AutoDiffVector():
         ------------
         output: A new AutoDiffVector instance
         """
-        new = copy.deepcopy(self)
         try:
-            new.val = np.power(other.val, self.val)
-            new.der = self.val * np.power(other.val, self.val - 1) * other.der + new.val * np.log(other.val) * self.der
+            val = np.power(other.val, self.val)
+            return AutoDiffVector(val, self.val * np.power(other.val, self.val - 1) * other.der
+                                  + val * np.log(other.val) * self.der)
         except AttributeError:
-            new.val = np.power(other, self.val)
-            new.der = new.val * np.log(other) * self.der
-        return new
+            val = np.power(other, self.val)
+            return AutoDiffVector(val, val * np.log(other) * self.der)
 
     def partial(self, vari):
         """
@@ -219,10 +300,16 @@ class AutoDiffVector():
         :return: return the partial derivative
         """
         try:
-            idx = np.nonzero(vari.der)[0]
+            if isinstance(vari.der, SparseTangent):
+                idx = [ii for ii, value in vari.der.entries.items() if value != 0]
+            else:
+                # the columns the variable is seeded in, the same for every row of a batched variable
+                idx = np.nonzero(np.any(np.atleast_2d(vari.der) != 0, axis=0))[0]
             if len(idx) > 1:
                 print('Not an independent variable')
                 raise TypeError
+            if isinstance(self.der, SparseTangent):
+                return np.atleast_1d(self.der.entries.get(idx[0], 0.))
             if len(self.der.shape) == 1:
                 self.der = self.der.reshape(1, -1)
             return self.der[:, idx[0]]
@@ -240,10 +327,11 @@ class AutoDiffVector():
         ------------
         output: return a boolean variable, true if two instances are equal
         """
+        der_diff = np.abs(_dense(self.der) - _dense(other.der))
         try:
-            return np.abs(self.val - other.val) < 1e-6 and np.abs(self.der - other.der) < 1e-6
+            return np.abs(self.val - other.val) < 1e-6 and der_diff < 1e-6
         except ValueError:
-            return (np.abs(self.val - other.val)).all() < 1e-6 and (np.abs(self.der - other.der)).all() < 1e-6
+            return (np.abs(self.val - other.val)).all() < 1e-6 and der_diff.all() < 1e-6
     def __ne__(self, other):
         """
         compare two AutoDiffVectors
@@ -254,6 +342,304 @@ class AutoDiffVector():
         """
         return ~self.__eq__(other)
 
+    # Methods named after the numpy ufuncs, numpy calls them when np.sin, np.exp... are applied to an
+    # AutoDiffVector. This lets code that evaluates numpy functions on its values, like the edges of
+    # reverse mode, carry forward mode tangents (see reverse.hvp).
+    def sin(self):
+        return sin_ad(self)
+
+    def cos(self):
+        return cos_ad(self)
+
+    def tan(self):
+        return tan_ad(self)
+
+    def arcsin(self):
+        return arcsin_ad(self)
+
+    def arccos(self):
+        return arccos_ad(self)
+
+    def arctan(self):
+        return arctan_ad(self)
+
+    def exp(self):
+        return exp_ad(self)
+
+    def log(self):
+        return log_ad(self)
+
+    def sinh(self):
+        return sinh_ad(self)
+
+    def cosh(self):
+        return cosh_ad(self)
+
+    def tanh(self):
+        return tanh_ad(self)
+
+    def sqrt(self):
+        return sqrt_ad(self)
+
+
+def _taylor_div(a, b):
+    """
+    Taylor coefficients of a / b, from b * c = a: c_k = (a_k - sum_{j=1..k} b_j c_{k-j}) / b_0
+    """
+    c = np.zeros(len(a))
+    for k in range(len(a)):
+        c[k] = (a[k] - np.dot(b[1:k + 1], c[:k][::-1])) / b[0]
+    return c
+
+
+def _taylor_integrate(a, f0, g):
+    """
+    Taylor coefficients of f(a) given f0 = f(a_0) and the coefficients g of f'(a), from f(a)' = f'(a) a':
+    f_k = 1/k sum_{j=1..k} j a_j g_{k-j}
+    """
+    f = np.zeros(len(a))
+    f[0] = f0
+    ja = np.arange(len(a)) * a
+    for k in range(1, len(a)):
+        f[k] = np.dot(ja[1:k + 1], g[:k][::-1]) / k
+    return f
+
+
+def _taylor_exp(a):
+    """
+    Taylor coefficients of exp(a), from e' = e a'
+    """
+    e = np.zeros(len(a))
+    e[0] = np.exp(a[0])
+    ja = np.arange(len(a)) * a
+    for k in range(1, len(a)):
+        e[k] = np.dot(ja[1:k + 1], e[:k][::-1]) / k
+    return e
+
+
+def _taylor_log(a):
+    """
+    Taylor coefficients of log(a), from a l' = a': l_k = (a_k - 1/k sum_{j=1..k-1} j l_j a_{k-j}) / a_0
+    """
+    l = np.zeros(len(a))
+    l[0] = np.log(a[0])
+    for k in range(1, len(a)):
+        jl = np.arange(1, k) * l[1:k]
+        l[k] = (a[k] - np.dot(jl, a[k - 1:0:-1]) / k) / a[0]
+    return l
+
+
+def _taylor_sincos(a, sign=-1):
+    """
+    Taylor coefficients of (sin(a), cos(a)), from s' = c a' and c' = -s a'.
+    With sign=1, those of (sinh(a), cosh(a)) instead
+    """
+    s = np.zeros(len(a))
+    c = np.zeros(len(a))
+    s[0], c[0] = (np.sin(a[0]), np.cos(a[0])) if sign < 0 else (np.sinh(a[0]), np.cosh(a[0]))
+    ja = np.arange(len(a)) * a
+    for k in range(1, len(a)):
+        s[k] = np.dot(ja[1:k + 1], c[:k][::-1]) / k
+        c[k] = sign * np.dot(ja[1:k + 1], s[:k][::-1]) / k
+    return s, c
+
+
+def _taylor_pow(a, r):
+    """
+    Taylor coefficients of a ** r for a constant r, from a p' = r p a':
+    p_k = 1/(k a_0) sum_{j=1..k} ((r + 1) j - k) a_j p_{k-j}.
+    Non negative integer powers use Cauchy products instead, which also work when a_0 is 0
+    """
+    if float(r).is_integer() and r >= 0:
+        p = np.zeros(len(a))
+        p[0] = 1.
+        base = a
+        r = int(r)
+        while r:
+            if r & 1:
+                p = np.convolve(p, base)[:len(a)]
+            base = np.convolve(base, base)[:len(a)]
+            r >>= 1
+        return p
+    p = np.zeros(len(a))
+    p[0] = a[0] ** r
+    j = np.arange(len(a))
+    for k in range(1, len(a)):
+        p[k] = np.dot(((r + 1) * j[1:k + 1] - k) * a[1:k + 1], p[:k][::-1]) / (k * a[0])
+    return p
+
+
+class AutoDiffTaylor():
+    """
+    A forward mode variable carrying a truncated Taylor series instead of a single derivative.
+    coef[k] is the k-th Taylor coefficient f^(k)(t) / k! of the value along its direction t, up to the order.
+    Every operation computes the coefficients of its result with the standard recurrences: Cauchy products for
+    products and quotients, and the differential equation of the function for exp, log, sin, pow...
+    So the first k derivatives cost O(k^2) per operation instead of nesting forward mode k times.
+    """
+    __slots__ = ('coef',)
+
+    def __init__(self, a, order=1, der=1):
+        """
+        AutoDiffTaylor class constructor.
+        :param a: the value of the variable
+        :param order: the number of derivatives carried
+        :param der: the first derivative of the variable along t, 1 for the independent variable
+        """
+        self.coef = np.zeros(order + 1)
+        self.coef[0] = a
+        if order:
+            self.coef[1] = der
+
+    @classmethod
+    def from_coef(cls, coef):
+        """
+        Builds a variable from its Taylor coefficients, e.g. a truncated solution of an ODE
+        """
+        new = cls.__new__(cls)
+        new.coef = np.asarray(coef, dtype=float)
+        return new
+
+    def __repr__(self):
+        return f'AutoDiffTaylor({self.coef.tolist()})'
+
+    @property
+    def order(self):
+        return len(self.coef) - 1
+
+    @property
+    def val(self):
+        return self.coef[0]
+
+    @property
+    def der(self):
+        """
+        The first derivative
+        """
+        return self.coef[1] if self.order else 0.
+
+    def derivatives(self):
+        """
+        Returns the value and the derivatives f, f', f'', ... up to the order as a numpy array
+        """
+        return self.coef * np.cumprod(np.concatenate([[1.], np.arange(1., len(self.coef))]))
+
+    def _other(self, other):
+        """
+        The Taylor coefficients of the other operand, a constant has the same value all along t
+        """
+        if isinstance(other, AutoDiffTaylor):
+            return other.coef
+        coef = np.zeros(len(self.coef))
+        coef[0] = other
+        return coef
+
+    def __add__(self, other):
+        return AutoDiffTaylor.from_coef(self.coef + self._other(other))
+
+    def __radd__(self, other):
+        return self.__add__(other)
+
+    def __sub__(self, other):
+        return AutoDiffTaylor.from_coef(self.coef - self._other(other))
+
+    def __rsub__(self, other):
+        return AutoDiffTaylor.from_coef(self._other(other) - self.coef)
+
+    def __neg__(self):
+        return AutoDiffTaylor.from_coef(-self.coef)
+
+    def __mul__(self, other):
+        if isinstance(other, AutoDiffTaylor):
+            return AutoDiffTaylor.from_coef(np.convolve(self.coef, other.coef)[:len(self.coef)])
+        return AutoDiffTaylor.from_coef(self.coef * other)
+
+    def __rmul__(self, other):
+        return self.__mul__(other)
+
+    def __truediv__(self, other):
+        if isinstance(other, AutoDiffTaylor):
+            return AutoDiffTaylor.from_coef(_taylor_div(self.coef, other.coef))
+        return AutoDiffTaylor.from_coef(self.coef / other)
+
+    def __rtruediv__(self, other):
+        return AutoDiffTaylor.from_coef(_taylor_div(self._other(other), self.coef))
+
+    def __pow__(self, other):
+        if isinstance(other, AutoDiffTaylor):
+            return (other * self.log()).exp()
+        return AutoDiffTaylor.from_coef(_taylor_pow(self.coef, other))
+
+    def __rpow__(self, other):
+        return AutoDiffTaylor.from_coef(_taylor_exp(self.coef * np.log(other)))
+
+    # Named after the numpy ufuncs like the methods of AutoDiffVector, the *_ad functions dispatch to them
+    def sin(self):
+        return AutoDiffTaylor.from_coef(_taylor_sincos(self.coef)[0])
+
+    def cos(self):
+        return AutoDiffTaylor.from_coef(_taylor_sincos(self.coef)[1])
+
+    def tan(self):
+        return AutoDiffTaylor.from_coef(_taylor_div(*_taylor_sincos(self.coef)))
+
+    def arcsin(self):
+        g = _taylor_pow(self._other(1.) - np.convolve(self.coef, self.coef)[:len(self.coef)], -0.5)
+        return AutoDiffTaylor.from_coef(_taylor_integrate(self.coef, np.arcsin(self.coef[0]), g))
+
+    def arccos(self):
+        g = _taylor_pow(self._other(1.) - np.convolve(self.coef, self.coef)[:len(self.coef)], -0.5)
+        return AutoDiffTaylor.from_coef(_taylor_integrate(self.coef, np.arccos(self.coef[0]), -g))
+
+    def arctan(self):
+        g = _taylor_div(self._other(1.), self._other(1.) + np.convolve(self.coef, self.coef)[:len(self.coef)])
+        return AutoDiffTaylor.from_coef(_taylor_integrate(self.coef, np.arctan(self.coef[0]), g))
+
+    def exp(self):
+        return AutoDiffTaylor.from_coef(_taylor_exp(self.coef))
+
+    def log(self):
+        return AutoDiffTaylor.from_coef(_taylor_log(self.coef))
+
+    def sinh(self):
+        return AutoDiffTaylor.from_coef(_taylor_sincos(self.coef, sign=1)[0])
+
+    def cosh(self):
+        return AutoDiffTaylor.from_coef(_taylor_sincos(self.coef, sign=1)[1])
+
+    def tanh(self):
+        return AutoDiffTaylor.from_coef(_taylor_div(*_taylor_sincos(self.coef, sign=1)))
+
+    def logistic(self):
+        return 1 / (1 + (-self).exp())
+
+    def sqrt(self):
+        return self ** 0.5
+
+
+def _taylor_dispatch(func):
+    """
+    Decorator sending an AutoDiffTaylor input of an elementary function to the method of the same name
+    """
+    name = func.__name__[:-len('_ad')]
+
+    def wrapper(x):
+        if isinstance(x, AutoDiffTaylor):
+            return getattr(x, name)()
+        return func(x)
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+
+def _fused(kernel, x):
+    """
+    Applies an elementary function to an AutoDiffVector with a kernel of kernels.py, which evaluates
+    the value and the derivative together
+    """
+    val, der = kernel(x.val)
+    return AutoDiffVector(val, der * x.der)
+
 
 """
 Below is a set of elementary functions for AutoDiffVectors. The calculation of them are self-evident.
@@ -264,47 +650,35 @@ Return: return a new AutoDiffVector instance after the calculation
 
 """
 
+@_taylor_dispatch
 def sin_ad(x):
-    y = copy.deepcopy(x)
-    y.val = np.sin(x.val)
-    y.der = np.cos(x.val) * x.der
-    return y
+    return _fused(kernels.sin, x)
 
 
+@_taylor_dispatch
 def cos_ad(x):
-    y = copy.deepcopy(x)
-    y.val = np.cos(x.val)
-    y.der = -np.sin(x.val) * x.der
-    return y
+    return _fused(kernels.cos, x)
 
 
+@_taylor_dispatch
 def tan_ad(x):
-    y = copy.deepcopy(x)
-    y.val = np.tan(x.val)
-    y.der = np.power(1. / np.cos(x.val), 2.) * x.der
-    return y
+    return _fused(kernels.tan, x)
 
 
 # Boer Dec4
+@_taylor_dispatch
 def arcsin_ad(x):
-    y = copy.deepcopy(x)
-    y.val = np.arcsin(x.val)
-    y.der = 1 / (1 - x.val ** 2) ** 0.5 * x.der
-    return y
+    return _fused(kernels.arcsin, x)
 
 
+@_taylor_dispatch
 def arccos_ad(x):
-    y = copy.deepcopy(x)
-    y.val = np.arccos(x.val)
-    y.der = -1 / (1 - x.val ** 2) ** 0.5 * x.der
-    return y
+    return _fused(kernels.arccos, x)
 
 
+@_taylor_dispatch
 def arctan_ad(x):
-    y = copy.deepcopy(x)
-    y.val = np.arctan(x.val)
-    y.der = 1 / (1 + x.val ** 2) * x.der
-    return y
+    return _fused(kernels.arctan, x)
 
 
 def expa_ad(a, x):
@@ -312,10 +686,10 @@ def expa_ad(a, x):
     Input `a` should be a scaler variable such as a int or float. `a` is an arbitrary base for the calculation.
 
     """
-    y = copy.deepcopy(x)
-    y.val = a ** x.val
-    y.der = a ** x.val * np.log(a) * x.der
-    return y
+    if isinstance(x, AutoDiffTaylor):
+        return a ** x
+    val, der = kernels.expa(a, x.val)
+    return AutoDiffVector(val, der * x.der)
 
 
 def loga_ad(a, x):
@@ -323,49 +697,39 @@ def loga_ad(a, x):
     Input `a` should be a scaler variable such as a int or float. `a` is an arbitrary base for the calculation.
 
     """
-    y = copy.deepcopy(x)
-    y.val = np.log(x.val) / np.log(a)
-    y.der = 1 / (x.val * np.log(a)) * x.der
-    return y
+    if isinstance(x, AutoDiffTaylor):
+        return x.log() / np.log(a)
+    val, der = kernels.loga(a, x.val)
+    return AutoDiffVector(val, der * x.der)
 
 
+@_taylor_dispatch
 def log_ad(x):
-    y = copy.deepcopy(x)
-    y.val = np.log(x.val)
-    y.der = 1 / (x.val) * x.der
-    return y
+    return _fused(kernels.log, x)
 
 
+@_taylor_dispatch
 def sinh_ad(x):
-    y = copy.deepcopy(x)
-    y.val = np.sinh(x.val)
-    y.der = np.cosh(x.val) * x.der
-    return y
+    return _fused(kernels.sinh, x)
 
 
+@_taylor_dispatch
 def cosh_ad(x):
-    y = copy.deepcopy(x)
-    y.val = np.cosh(x.val)
-    y.der = np.sinh(x.val) * x.der
-    return y
+    return _fused(kernels.cosh, x)
 
 
+@_taylor_dispatch
 def tanh_ad(x):
-    y = copy.deepcopy(x)
-    y.val = np.tanh(x.val)
-    y.der = (np.cosh(x.val) ** 2 - np.sinh(x.val) ** 2) / (np.cosh(x.val) ** 2) * x.der
-    return y
+    return _fused(kernels.tanh, x)
 
 
+@_taylor_dispatch
 def logistic_ad(x):
     """
     We choose logistic function as 1/(1+exp(-x))
 
     """
-    y = copy.deepcopy(x)
-    y.val = 1 / (1 + np.exp(-x.val))
-    y.der = np.exp(x.val) / (1 + np.exp(x.val)) ** 2 * x.der
-    return y
+    return _fused(kernels.logistic, x)
 
 
 def sqrt_ad(x):
@@ -382,42 +746,140 @@ Return: return a new AutoDiffVector instance after the calculation
 """
 
 # Boer Dec 5
+@_taylor_dispatch
 def exp_ad(x):
-    y = copy.deepcopy(x)
-    y.val = np.exp(x.val)
-    y.der = np.exp(x.val) * x.der
-    return y
+    return _fused(kernels.exp, x)
 
 
 
 def mul_ad(x):
     """
     A function to mupltiply multiple AutoDiffVector variables. This is to make calculation like f=x1x2x3...x100 more convenient.
+    The derivative is built with the product rule in one go, d(x1...xn) = sum_i (x1...x(i-1)) (x(i+1)...xn) dxi,
+    where the prefix and suffix products come from cumulative products. It runs in linear time without recursion.
     ---------------
-    vx: AutoDiffVector variables
+    vx: AutoDiffVector variables, int or float factors are allowed as well
     ---------------
     return: The result of Mutiplication
     ---------------
     """
-    return x[0] * mul_ad(x[1:]) if len(x) > 1 else x[0]
-
-
-
-def gen_vars(vvars):
+    if len(x) == 1:
+        return x[0]
+    vals = np.stack(np.broadcast_arrays(*[ii.val if isinstance(ii, AutoDiffVector) else ii for ii in x]))
+    ones = np.ones((1,) + vals.shape[1:])
+    prefix = np.concatenate([ones, np.cumprod(vals[:-1], axis=0)])
+    suffix = np.concatenate([np.cumprod(vals[:0:-1], axis=0)[::-1], ones])
+    coef = prefix * suffix
+    val = prefix[-1] * vals[-1]
+    terms = [cc * ii.der for ii, cc in zip(x, coef) if isinstance(ii, AutoDiffVector)]
+    if not terms:
+        return val
+    return AutoDiffVector(val, _sum_ders(terms))
+
+
+
+def gen_vars(vvars, sparse=False):
     """
     vectorize the inputs of the function from Rm to Rn
     ---------------
     vvars: a list of initial values of different variables
+    sparse: if True, the derivatives are stored as SparseTangent instances, so each variable and
+            each intermediate only keeps the entries it depends on instead of a dense vector of length n
     ---------------
     return: a list of AutoDiffVectors, which are different variables. The variables for a same function should be defined together using gen_vars.
     ---------------
     Example:
     [x,y,z,t]=ad.gen_vars([3.,np.pi,5.,3.4])
+    v=ad.gen_vars(np.ones(100000), sparse=True)
     """
     vars = []
     nvars = len(vvars)
+    if sparse:
+        return [AutoDiffVector(vvars[ii], SparseTangent({ii: 1.}, nvars)) for ii in range(nvars)]
     for ii in range(len(vvars)):
         der = np.zeros(nvars)
         der[ii] = 1
         vars.append(AutoDiffVector(vvars[ii], der))
     return vars
+
+
+
+def gen_batch_vars(vvars):
+    """
+    vectorize the inputs of the function over a batch of input points, so one evaluation of the
+    function gives its values and gradients at every point
+    ---------------
+    vvars: a list with one entry per variable, each entry holds the values of that variable at the B points
+    ---------------
+    return: a list of AutoDiffVectors. Each val has shape (B, 1) and each der has shape (B, n), n being
+            the number of variables, so every result carries one row per point and f.der[k] is the
+            gradient at point k. AutoDiffVector.vconvert stacks m such results into values of shape (m, B)
+            and derivatives of shape (m, B, n)
+    ---------------
+    Example:
+    [x,y]=ad.gen_batch_vars([np.linspace(0,1,10000), np.linspace(1,2,10000)])
+    f=ad.sin_ad(x)*y
+    jac=ad.AutoDiffVector.vconvert([f, x*y]).der
+    """
+    values = [np.asarray(vv, dtype=float).reshape(-1, 1) for vv in vvars]
+    nvars = len(values)
+    vars = []
+    for ii in range(nvars):
+        der = np.zeros((len(values[ii]), nvars))
+        der[:, ii] = 1
+        vars.append(AutoDiffVector(values[ii], der))
+    return vars
+
+
+def jvp(f, x, v):
+    """
+    Jacobian-vector product J(x) v of f, computed with a single forward pass whatever the number of inputs.
+    Each input is seeded with its component of the direction v instead of a unit vector.
+    ---------------
+    f: a function taking one AutoDiffVector per input and returning an AutoDiffVector or a list of them
+    x: a list of input values
+    v: a list with the direction, one entry per input
+    ---------------
+    return: a tuple (value, product). For a list of outputs both are numpy arrays with one entry per output
+    ---------------
+    Example:
+    val, prod = ad.jvp(lambda x, y: [x*y, ad.sin_ad(x)], [1., 2.], [1., 0.5])
+    """
+    out = f(*[AutoDiffVector(xx, vv) for xx, vv in zip(x, v)])
+    if not isinstance(out, (list, tuple)):
+        return out.val, out.der
+    # outputs that do not depend on any input are plain numbers
+    vals = [ii.val if isinstance(ii, AutoDiffVector) else ii for ii in out]
+    ders = [ii.der if isinstance(ii, AutoDiffVector) else 0. for ii in out]
+    return np.array(vals), np.array(ders)
+
+
+def taylor_ode(f, x0, order):
+    """
+    Taylor coefficients at t = 0 of the solution of the autonomous ODE x' = f(x), x(0) = x0, the building
+    block of a Taylor series integrator. Coefficient k + 1 only depends on the coefficients up to k through
+    x_{k+1} = f(x)_k / (k + 1), so they are found one order at a time by running f on AutoDiffTaylor states.
+    Cost: f is run again from scratch for every order, on series of growing length, and every operation of
+    f costs O(k^2) on a series of length k + 1, so the whole call costs O(order^3) operations per operation
+    of f where an online evaluation would cost O(order^2). This is fine for the orders of Taylor integrators
+    (up to a few tens) but grows quickly beyond.
+    ---------------
+    f: a function taking one AutoDiffTaylor per state component and returning the list of the derivatives,
+       written with operators and the *_ad functions
+    x0: a list with the initial state
+    order: the number of coefficients after the initial state
+    ---------------
+    return: a numpy array of shape (order + 1, n), row k holds x^(k)(0) / k!
+    ---------------
+    Example:
+    ##x' = -x**2 with x(0) = 1 is solved by 1 / (1 + t), coef[:, 0] is [1, -1, 1, -1, ...]
+    coef = ad.taylor_ode(lambda x: [-x * x], [1.], 10)
+    ##x(h) for a step h is then np.polyval(coef[::-1, 0], h)
+    """
+    coef = np.zeros((order + 1, len(x0)))
+    coef[0] = x0
+    for k in range(order):
+        out = f(*[AutoDiffTaylor.from_coef(coef[:k + 1, ii]) for ii in range(len(x0))])
+        # components with a constant derivative come back as plain numbers
+        coef[k + 1] = [(ii.coef[k] if isinstance(ii, AutoDiffTaylor) else ii * (k == 0)) / (k + 1) for ii in out]
+    return coef
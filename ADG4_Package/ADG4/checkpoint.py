@@ -0,0 +1,95 @@
+import math
+
+import numpy as np
+from .reverse import AutoDiffReverse, vjp
+
+"""
+checkpoint.py: Reverse mode through long time-stepping loops with bounded memory.
+
+Differentiating x_N = step(step(...step(x_0))) in one AutoDiffReverse graph keeps every intermediate
+node alive until the backward pass, so memory grows with the number of steps. Here only a few states
+(the checkpoints) are stored during the forward pass. The backward pass recomputes the states of one
+segment at a time from its checkpoint and runs a one-step reverse sweep per step, so only one segment
+of states and one step graph are alive at any time. The price is a second forward pass.
+
+NOTES:
+
+        import ADG4.checkpoint as cp
+        import ADG4.reverse as rev
+        ##a pendulum integrated with explicit Euler, the state is (angle, velocity)
+        def step(theta, omega):
+            return [theta + 0.01 * omega, omega - 0.01 * rev.sin_rv(theta)]
+        ##gradient of the final angle with respect to the initial state
+        xN, grad = cp.checkpointed_vjp(step, [1., 0.], 100000, [1., 0.], max_checkpoints=300)
+
+"""
+
+
+def _advance(step, state):
+    """
+    Runs one step on plain values, the small graph built for it is dropped right away
+    """
+    out = step(*[AutoDiffReverse(ss) for ss in state])
+    return [ii.val if isinstance(ii, AutoDiffReverse) else ii for ii in out]
+
+
+def _forward(step, x0, n_steps, max_checkpoints):
+    """
+    Runs the loop and stores one state every stride steps
+    ---------------
+    return: a tuple (final state, checkpoints, stride)
+    """
+    if max_checkpoints is None:
+        max_checkpoints = max(1, int(math.sqrt(n_steps)))
+    stride = max(1, math.ceil(n_steps / max_checkpoints))
+    state = list(x0)
+    checkpoints = []
+    for kk in range(n_steps):
+        if kk % stride == 0:
+            checkpoints.append(state)
+        state = _advance(step, state)
+    return state, checkpoints, stride
+
+
+def _backward(step, n_steps, u, checkpoints, stride):
+    """
+    Runs the segments backward, recomputing the states of each one from its checkpoint
+    """
+    adjoint = np.asarray(u, dtype=float)
+    for start in reversed(range(0, n_steps, stride)):
+        segment = [checkpoints[start // stride]]
+        for kk in range(start + 1, min(start + stride, n_steps)):
+            segment.append(_advance(step, segment[-1]))
+        for state in reversed(segment):
+            adjoint = vjp(step, state, adjoint)[1]
+    return adjoint
+
+
+def checkpointed_vjp(step, x0, n_steps, u, max_checkpoints=None):
+    """
+    Vector-Jacobian product u^T d x_N / d x_0 of a time-stepping loop, with at most max_checkpoints stored states.
+    ---------------
+    step: a function taking one AutoDiffReverse per state component and returning the list of the next components
+    x0: a list with the initial state
+    n_steps: the number of steps
+    u: a list of weights of the final state components
+    max_checkpoints: the memory budget, the number of states stored during the forward pass.
+                     The default sqrt(n_steps) balances the checkpoints against the states of one segment.
+    ---------------
+    return: a tuple (final state, product), both numpy arrays with one entry per state component
+    """
+    final, checkpoints, stride = _forward(step, x0, n_steps, max_checkpoints)
+    return np.array(final), _backward(step, n_steps, u, checkpoints, stride)
+
+
+def checkpointed_gradient(step, x0, n_steps, loss, max_checkpoints=None):
+    """
+    Gradient of loss(x_N) with respect to the initial state of a time-stepping loop, see checkpointed_vjp.
+    ---------------
+    loss: a function taking one AutoDiffReverse per state component and returning a scalar AutoDiffReverse
+    ---------------
+    return: a tuple (loss value, gradient), the gradient has one entry per state component
+    """
+    final, checkpoints, stride = _forward(step, x0, n_steps, max_checkpoints)
+    value, u = vjp(loss, final, 1.)
+    return value, _backward(step, n_steps, u, checkpoints, stride)
@@ -0,0 +1,75 @@
+import numpy as np
+from . import ad, reverse, tape
+
+"""
+functions.py: Elementary functions shared by every mode.
+
+Each function looks at the type of its input and calls the matching implementation: sin_ad for an
+AutoDiffVector or an AutoDiffTaylor, sin_rv for an AutoDiffReverse, sin_tp for a TapeVar, and numpy for plain
+numbers and arrays.
+A function written with these, e.g. for jacobian.jacobian, runs unchanged in forward mode, reverse mode,
+on a tape or on plain values.
+
+NOTES:
+
+        import ADG4.functions as fn
+        def f(x, y):
+            return [fn.sin(x) * y, fn.exp(x * y), fn.loga(2, y)]
+
+"""
+
+
+def _elementary(name, plain):
+    """
+    Builds the function `name` dispatching on the type of its input, plain is used for numbers and arrays
+    """
+    implementations = ((ad.AutoDiffVector, getattr(ad, name + '_ad')),
+                       (ad.AutoDiffTaylor, getattr(ad, name + '_ad')),
+                       (reverse.AutoDiffReverse, getattr(reverse, name + '_rv')),
+                       (tape.TapeVar, getattr(tape, name + '_tp')))
+
+    def func(x):
+        for cls, implementation in implementations:
+            if isinstance(x, cls):
+                return implementation(x)
+        return plain(x)
+    func.__name__ = name
+    func.__doc__ = f'{name} of an AutoDiffVector, AutoDiffReverse, TapeVar or plain value'
+    return func
+
+
+def _elementary_base(name, plain):
+    """
+    Same as _elementary for the functions taking a scalar base `a` first
+    """
+    implementations = ((ad.AutoDiffVector, getattr(ad, name + '_ad')),
+                       (ad.AutoDiffTaylor, getattr(ad, name + '_ad')),
+                       (reverse.AutoDiffReverse, getattr(reverse, name + '_rv')),
+                       (tape.TapeVar, getattr(tape, name + '_tp')))
+
+    def func(a, x):
+        for cls, implementation in implementations:
+            if isinstance(x, cls):
+                return implementation(a, x)
+        return plain(a, x)
+    func.__name__ = name
+    func.__doc__ = (f'{name} of an AutoDiffVector, AutoDiffReverse, TapeVar or plain value. '
+                    'Input `a` should be a scaler variable such as a int or float.')
+    return func
+
+
+sin = _elementary('sin', np.sin)
+cos = _elementary('cos', np.cos)
+tan = _elementary('tan', np.tan)
+arcsin = _elementary('arcsin', np.arcsin)
+arccos = _elementary('arccos', np.arccos)
+arctan = _elementary('arctan', np.arctan)
+exp = _elementary('exp', np.exp)
+log = _elementary('log', np.log)
+sinh = _elementary('sinh', np.sinh)
+cosh = _elementary('cosh', np.cosh)
+tanh = _elementary('tanh', np.tanh)
+logistic = _elementary('logistic', lambda x: 1 / (1 + np.exp(-x)))
+sqrt = _elementary('sqrt', np.sqrt)
+expa = _elementary_base('expa', lambda a, x: a ** x)
+loga = _elementary_base('loga', lambda a, x: np.log(x) / np.log(a))
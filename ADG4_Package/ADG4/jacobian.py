@@ -0,0 +1,181 @@
+import concurrent.futures
+
+import numpy as np
+from .ad import AutoDiffVector
+from .reverse import AutoDiffReverse
+
+"""
+jacobian.py: A single Jacobian entry point picking forward or reverse mode.
+
+Forward mode carries one tangent entry per input through every operation, reverse mode one adjoint
+entry per output through every edge. So forward mode is cheaper for few inputs and many outputs and
+reverse mode for the contrary. jacobian(f, x) compares the two dimensions and uses the cheaper mode.
+The function must be written with operators and the elementary functions of ADG4.functions so that
+it runs in both modes.
+
+NOTES:
+
+        import ADG4.functions as fn
+        from ADG4.jacobian import jacobian
+        def f(x, y, z):
+            return [fn.sin(x) * y + z, fn.exp(x * y * z)]
+        val, jac = jacobian(f, [1., 2., 3.])
+
+        ##columns (forward) or rows (reverse) are independent and can be split over a pool of workers.
+        ##A process pool needs f to be defined at the top level of a module so that it can be pickled.
+        val, jac = jacobian(f, [1., 2., 3.], n_jobs=4, executor='process')
+
+"""
+
+MODES = ('auto', 'forward', 'reverse')
+# pool classes by name, looked up on first use since the process pool pulls in multiprocessing
+EXECUTORS = {'process': 'ProcessPoolExecutor', 'thread': 'ThreadPoolExecutor'}
+
+
+def _outputs(out):
+    return list(out) if isinstance(out, (list, tuple)) else [out]
+
+
+def choose_mode(n_inputs, n_outputs):
+    """
+    Returns 'forward' when there are no more inputs than outputs, 'reverse' otherwise
+    """
+    return 'forward' if n_inputs <= n_outputs else 'reverse'
+
+
+def _forward_columns(f, x, cols):
+    """
+    Values and Jacobian columns cols of f at x, seeding only the inputs in cols. Top level so process pools can pickle it
+    """
+    seeds = np.zeros((len(x), len(cols)))
+    seeds[cols, np.arange(len(cols))] = 1
+    outs = _outputs(f(*[AutoDiffVector(xx, ss) for xx, ss in zip(x, seeds)]))
+    vals = np.array([ii.val if isinstance(ii, AutoDiffVector) else ii for ii in outs], dtype=float)
+    block = np.zeros((len(outs), len(cols)))
+    for row, ii in enumerate(outs):
+        if isinstance(ii, AutoDiffVector):
+            block[row] = ii.der
+    return vals, block
+
+
+def _reverse_rows(f, x, rows):
+    """
+    Values and Jacobian rows rows of f at x, one backward sweep per row. Top level so process pools can pickle it
+    """
+    inputs = [AutoDiffReverse(xx) for xx in x]
+    outs = _outputs(f(*inputs))
+    vals = np.array([ii.val if isinstance(ii, AutoDiffReverse) else ii for ii in outs], dtype=float)
+    if rows is None:
+        rows = range(len(outs))
+    block = np.zeros((len(rows), len(x)))
+    active = [kk for kk, row in enumerate(rows) if isinstance(outs[row], AutoDiffReverse)]
+    if active:
+        block[active] = AutoDiffReverse.jacobian([outs[rows[kk]] for kk in active], wrt=inputs)[0]
+    return vals, block
+
+
+def _check_workers(n_jobs, chunk_size):
+    """
+    Raises a ValueError unless n_jobs is a positive integer and chunk_size is None or a positive integer
+    """
+    if not isinstance(n_jobs, (int, np.integer)) or n_jobs < 1:
+        raise ValueError(f'n_jobs should be a positive integer, got {n_jobs!r}')
+    if chunk_size is not None and (not isinstance(chunk_size, (int, np.integer)) or chunk_size < 1):
+        raise ValueError(f'chunk_size should be None or a positive integer, got {chunk_size!r}')
+
+
+def _chunks(n, n_jobs, chunk_size):
+    """
+    Splits range(n) into contiguous index arrays, n_jobs of them or of chunk_size entries
+    """
+    if chunk_size is None:
+        chunk_size = -(-n // n_jobs)
+    return [np.arange(start, min(start + chunk_size, n)) for start in range(0, n, max(1, chunk_size))]
+
+
+def _map(worker, f, x, chunks, n_jobs, executor):
+    """
+    Runs worker(f, x, chunk) for every chunk, in the calling thread when n_jobs is 1 and
+    on the given executor otherwise: 'process', 'thread' or a concurrent.futures.Executor instance
+    """
+    if n_jobs == 1 or len(chunks) <= 1:
+        return [worker(f, x, chunk) for chunk in chunks]
+    if isinstance(executor, concurrent.futures.Executor):
+        return list(executor.map(worker, [f] * len(chunks), [x] * len(chunks), chunks))
+    if executor not in EXECUTORS:
+        raise ValueError(f'executor should be one of {tuple(EXECUTORS)} or a concurrent.futures.Executor, '
+                         f'got {executor!r}')
+    with getattr(concurrent.futures, EXECUTORS[executor])(max_workers=n_jobs) as pool:
+        return list(pool.map(worker, [f] * len(chunks), [x] * len(chunks), chunks))
+
+
+def forward_jacobian(f, x, n_jobs=1, executor='process', chunk_size=None):
+    """
+    Jacobian of f at x with forward mode, a single evaluation carrying one tangent entry per input
+    ---------------
+    n_jobs: the number of workers. With more than one, the columns are split into chunks and every
+            worker evaluates f seeding only the inputs of its chunk
+    executor: 'process', 'thread' or a concurrent.futures.Executor instance to run the chunks on
+    chunk_size: the number of columns per chunk, by default the columns are split evenly over n_jobs
+    ---------------
+    return: a tuple (values, jacobian), numpy arrays of shape (m,) and (m, n)
+    """
+    _check_workers(n_jobs, chunk_size)
+    x = list(x)
+    if n_jobs == 1 and chunk_size is None:
+        return _forward_columns(f, x, np.arange(len(x)))
+    results = _map(_forward_columns, f, x, _chunks(len(x), n_jobs, chunk_size), n_jobs, executor)
+    if not results:
+        return _forward_columns(f, x, np.arange(0))
+    return results[0][0], np.hstack([block for _, block in results])
+
+
+def reverse_jacobian(f, x, n_jobs=1, executor='process', chunk_size=None):
+    """
+    Jacobian of f at x with reverse mode, one backward sweep per output over a single graph
+    ---------------
+    n_jobs: the number of workers. With more than one, the rows are split into chunks and every
+            worker builds its own graph and runs the backward sweeps of its chunk
+    executor: 'process', 'thread' or a concurrent.futures.Executor instance to run the chunks on
+    chunk_size: the number of rows per chunk, by default the rows are split evenly over n_jobs
+    ---------------
+    return: a tuple (values, jacobian), numpy arrays of shape (m,) and (m, n)
+    """
+    _check_workers(n_jobs, chunk_size)
+    x = list(x)
+    if n_jobs == 1 and chunk_size is None:
+        return _reverse_rows(f, x, None)
+    # the number of outputs is only known after one evaluation
+    vals = np.array([ii.val if isinstance(ii, AutoDiffReverse) else ii
+                     for ii in _outputs(f(*[AutoDiffReverse(xx) for xx in x]))], dtype=float)
+    results = _map(_reverse_rows, f, x, _chunks(len(vals), n_jobs, chunk_size), n_jobs, executor)
+    if not results:
+        return vals, np.zeros((0, len(x)))
+    return vals, np.vstack([block for _, block in results])
+
+
+def jacobian(f, x, mode='auto', n_outputs=None, n_jobs=1, executor='process', chunk_size=None):
+    """
+    Jacobian of f at x, computed with forward or reverse mode
+    ---------------
+    f: a function taking one argument per input and returning one output or a list of them,
+       written with operators and ADG4.functions
+    x: a list of input values
+    mode: 'forward', 'reverse', or 'auto' to pick the cheaper one from the number of inputs and outputs
+    n_outputs: the number of outputs of f, if known. Otherwise 'auto' finds it by evaluating f once on plain values
+    n_jobs: the number of workers computing the Jacobian columns (forward) or rows (reverse) in parallel
+    executor: 'process', 'thread' or a concurrent.futures.Executor instance. A process pool needs a picklable f,
+              a thread pool only helps when f releases the GIL, e.g. on large numpy arrays
+    chunk_size: the number of columns or rows given to a worker at once, by default they are split evenly over n_jobs
+    ---------------
+    return: a tuple (values, jacobian), numpy arrays of shape (m,) and (m, n)
+    """
+    if mode not in MODES:
+        raise ValueError(f'mode should be one of {MODES}, got {mode!r}')
+    if mode == 'auto':
+        if n_outputs is None:
+            n_outputs = len(_outputs(f(*x)))
+        mode = choose_mode(len(x), n_outputs)
+    if mode == 'forward':
+        return forward_jacobian(f, x, n_jobs, executor, chunk_size)
+    return reverse_jacobian(f, x, n_jobs, executor, chunk_size)
@@ -0,0 +1,92 @@
+import numpy as np
+
+"""
+kernels.py: Fused value and derivative evaluation of the elementary functions.
+
+Every kernel returns the pair (f(x), f'(x)) and computes the transcendental part only once, reusing it for
+the derivative: tanh' = 1 - tanh^2, logistic' = s (1 - s), tan' = 1 + tan^2, exp' = exp...
+The forward mode functions of ad.py multiply the derivative by the tangent of their input, and the reverse
+mode functions of reverse.py store it as the edge to their input, so both modes share these kernels.
+x can be a number, a numpy array of any shape, or an AutoDiffVector (for forward-over-reverse).
+
+NOTES:
+
+        import ADG4.kernels as kn
+        val, der = kn.tanh(np.linspace(-3, 3, 1000000))
+
+"""
+
+
+def sin(x):
+    return np.sin(x), np.cos(x)
+
+
+def cos(x):
+    return np.cos(x), -np.sin(x)
+
+
+def tan(x):
+    t = np.tan(x)
+    return t, 1 + t * t
+
+
+def arcsin(x):
+    return np.arcsin(x), 1 / np.sqrt(1 - x * x)
+
+
+def arccos(x):
+    return np.arccos(x), -1 / np.sqrt(1 - x * x)
+
+
+def arctan(x):
+    return np.arctan(x), 1 / (1 + x * x)
+
+
+def exp(x):
+    e = np.exp(x)
+    return e, e
+
+
+def log(x):
+    return np.log(x), 1 / x
+
+
+def expa(a, x):
+    """
+    a ** x for a scalar base a
+    """
+    v = a ** x
+    return v, v * np.log(a)
+
+
+def loga(a, x):
+    """
+    Logarithm of x in a scalar base a
+    """
+    log_a = np.log(a)
+    return np.log(x) / log_a, 1 / (x * log_a)
+
+
+def sinh(x):
+    return np.sinh(x), np.cosh(x)
+
+
+def cosh(x):
+    return np.cosh(x), np.sinh(x)
+
+
+def tanh(x):
+    t = np.tanh(x)
+    return t, 1 - t * t
+
+
+def logistic(x):
+    """
+    1 / (1 + exp(-x))
+    """
+    s = 1 / (1 + np.exp(-x))
+    return s, s * (1 - s)
+
+
+KERNELS = {'sin': sin, 'cos': cos, 'tan': tan, 'arcsin': arcsin, 'arccos': arccos, 'arctan': arctan,
+           'exp': exp, 'log': log, 'sinh': sinh, 'cosh': cosh, 'tanh': tanh, 'logistic': logistic}
@@ -0,0 +1,186 @@
+import json
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+from . import reverse
+
+"""
+profiler.py: Opt-in instrumentation of reverse mode graphs.
+
+Inside a `with profile() as p:` block every AutoDiffReverse operation and every backward pass is recorded:
+    ops        the number of nodes built per op type and the time spent building them. Operators without
+               an op of their own are counted as the ops they are made of, e.g. x - y as neg and add
+    seconds    the time spent in each section: forward (building nodes), topological_order and backprop
+               (the backward pass), der, jacobian and vconvert. A section nested in another one is only
+               counted in the inner one, so the sections add up to the total time
+    graph      the size of the largest graph swept: nodes, edges, leaves, the largest number of operands of
+               a node (max_fan_in) and the largest number of nodes using the same node (max_fan_out)
+    backprop   the number of sweeps and of the nodes and edges they visited
+    cse_hits   the number of nodes shared by hash_consing()
+    peak_bytes the peak memory allocated in the block, above what was allocated when it started,
+               with profile(trace_memory=True)
+Outside such a block the instrumentation costs one check per operation.
+
+NOTES:
+
+        import ADG4.reverse as rev
+        from ADG4.profiler import profile
+        with profile(trace_memory=True) as p:
+            x = rev.AutoDiffReverse(0.5, name='x')
+            f = x
+            for _ in range(100):
+                f = rev.sin_rv(f) * f + f
+            f.der
+        print(p.report())
+        p.to_json('profile.json')
+
+"""
+
+
+class GraphProfile():
+    """
+    The counters filled while a profile() block is active, see the module docstring
+    """
+    def __init__(self):
+        """
+        GraphProfile class constructor, every counter starts at zero
+        """
+        self.op_nodes = Counter()
+        self.op_seconds = Counter()
+        self.seconds = Counter()
+        self.graph = {'nodes': 0, 'edges': 0, 'leaves': 0, 'max_fan_in': 0, 'max_fan_out': 0}
+        self.sweeps = 0
+        self.node_visits = 0
+        self.edge_visits = 0
+        self.cse_hits = 0
+        self.peak_bytes = None
+        # [section, start] of the running sections, the innermost last
+        self._stack = []
+
+    def call(self, section, func, args, kwargs, op=None):
+        """
+        Runs func(*args, **kwargs) as a section, op is the name of the node it builds if any
+        """
+        now = time.perf_counter()
+        if self._stack:
+            # the running section is paused while this one runs
+            outer = self._stack[-1]
+            self.seconds[outer[0]] += now - outer[1]
+        entry = [section, now]
+        self._stack.append(entry)
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            now = time.perf_counter()
+            self._stack.pop()
+            self.seconds[section] += now - entry[1]
+            if self._stack:
+                self._stack[-1][1] = now
+        if op is not None:
+            self.op_nodes[op] += 1
+            self.op_seconds[op] += now - entry[1]
+        elif section == 'topological_order':
+            self._graph(result)
+        elif section == 'backprop':
+            self._visits(args[0], result)
+        return result
+
+    def _graph(self, order):
+        """
+        Records the size of a sorted graph if it is the largest one so far
+        """
+        if len(order) < self.graph['nodes']:
+            return
+        fan_out = Counter()
+        edges = fan_in = leaves = 0
+        for node in order:
+            edges += len(node.children)
+            fan_in = max(fan_in, len(node.children))
+            leaves += not node.children
+            for child_node, _ in node.children:
+                fan_out[id(child_node)] += 1
+        self.graph = {'nodes': len(order), 'edges': edges, 'leaves': leaves, 'max_fan_in': fan_in,
+                      'max_fan_out': max(fan_out.values(), default=0)}
+
+    def _visits(self, order, adjoint):
+        """
+        Records the nodes and edges a backward sweep went through
+        """
+        self.sweeps += 1
+        for node in order:
+            if node in adjoint:
+                self.node_visits += 1
+                self.edge_visits += len(node.children)
+
+    def to_dict(self):
+        """
+        Returns the counters as a dict of plain Python types
+        """
+        return {'ops': {op: {'nodes': self.op_nodes[op], 'seconds': self.op_seconds[op]}
+                        for op in sorted(self.op_nodes, key=self.op_nodes.get, reverse=True)},
+                'seconds': dict(self.seconds),
+                'graph': dict(self.graph),
+                'backprop': {'sweeps': self.sweeps, 'node_visits': self.node_visits, 'edge_visits': self.edge_visits},
+                'cse_hits': self.cse_hits,
+                'peak_bytes': self.peak_bytes}
+
+    def to_json(self, path=None):
+        """
+        Returns the counters as a JSON string, and writes them to path if given
+        """
+        text = json.dumps(self.to_dict(), indent=1)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(text)
+        return text
+
+    def report(self):
+        """
+        Returns a human readable summary of the counters
+        """
+        lines = [f'{"op":<12} {"nodes":>10} {"ms":>10}']
+        for op, entry in self.to_dict()['ops'].items():
+            lines.append(f'{op:<12} {entry["nodes"]:>10} {entry["seconds"] * 1e3:10.3f}')
+        lines.append('sections: ' + ', '.join(f'{kk} {vv * 1e3:.3f} ms' for kk, vv in self.seconds.items()))
+        lines.append('largest graph: ' + ', '.join(f'{kk} {vv}' for kk, vv in self.graph.items()))
+        lines.append(f'backprop: {self.sweeps} sweeps, {self.node_visits} node visits, {self.edge_visits} edge visits')
+        if self.cse_hits:
+            lines.append(f'hash consing: {self.cse_hits} shared nodes')
+        if self.peak_bytes is not None:
+            lines.append(f'peak memory: {self.peak_bytes / 2 ** 20:.2f} MiB')
+        return '\n'.join(lines)
+
+
+@contextmanager
+def profile(trace_memory=False):
+    """
+    Records the reverse mode work done inside the block
+    ---------------
+    trace_memory: if True, also measure the peak memory allocated in the block with tracemalloc,
+                  which slows every allocation down
+    ---------------
+    return: the GraphProfile being filled, also usable once the block exits
+    """
+    previous = reverse._profiler
+    record = GraphProfile()
+    started = trace_memory and not tracemalloc.is_tracing()
+    # memory traced before the block, only nonzero when tracemalloc was already running
+    baseline = 0
+    if started:
+        tracemalloc.start()
+    elif trace_memory:
+        baseline = tracemalloc.get_traced_memory()[0]
+        # reset_peak is new in Python 3.9, before that the peak can predate the block
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+    reverse._profiler = record
+    try:
+        yield record
+    finally:
+        reverse._profiler = previous
+        if trace_memory:
+            record.peak_bytes = max(tracemalloc.get_traced_memory()[1] - baseline, 0)
+            if started:
+                tracemalloc.stop()
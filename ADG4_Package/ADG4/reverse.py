@@ -1,7 +1,9 @@
 import numpy as np
 import copy
-from collections import defaultdict
-import pandas as pd
+import functools
+from contextlib import contextmanager
+from . import kernels
+from .ad import AutoDiffVector, gen_vars
 
 """
 reverse.py: Automatic Differentiation for Python with reverse mode.
@@ -48,13 +50,104 @@ NOTES:
         ##print value and jacobian
         print(f.val, f.partial(x))
         
+        
+        Tensor Example:
+        
+        ##one node holds a whole array, the gradient of a scalar output has the shape of the variable
+        W = rev.TensorReverse(np.ones((3, 4)), name='W')
+        v = rev.TensorReverse(np.arange(4.), name='v')
+        f = rev.sum_rv(rev.tanh_rv(W @ v + 1))
+        print(f.val, f.partial(W))
+        
 
 """
 
+# Cache of the nodes built inside a hash_consing() block, None when hash consing is off
+_cse_cache = None
+
+@contextmanager
+def hash_consing():
+    """
+    Opt-in common-subexpression elimination. Inside a `with rev.hash_consing():` block, an operation applied to
+    the same operand nodes and equal constants as an earlier one returns the existing node instead of a new one,
+    which shrinks both the graph and the backward pass. Sums and products match regardless of the operand order.
+    Operations with array constants are never shared. The cache is dropped when the block exits.
+    ---------------
+    Example:
+    with rev.hash_consing():
+        f = rev.tan_rv(x) * rev.tan_rv(x) + rev.exp_rv(x) / rev.tan_rv(x)
+    """
+    global _cse_cache
+    previous = _cse_cache
+    _cse_cache = {} if previous is None else previous
+    try:
+        yield
+    finally:
+        _cse_cache = previous
+
+# Active GraphProfile of ADG4.profiler, None when profiling is off
+_profiler = None
+
+def _build(op, func, args, kwargs):
+    """
+    Runs the operation op, recorded by the active profile if any
+    """
+    if _profiler is None:
+        return func(*args, **kwargs)
+    return _profiler.call('forward', func, args, kwargs, op=op)
+
+def _hash_consed(op, commutative=False):
+    """
+    Decorator sharing the nodes built by an operation while hash consing is on.
+    The key is the op name with the operands, nodes compare by identity and constants by value.
+    It is also where a profile (see ADG4.profiler) records the node counts and the time per op.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _cse_cache is None:
+                if _profiler is None:
+                    return func(*args, **kwargs)
+                return _build(op, func, args, kwargs)
+            operands = tuple(sorted(args, key=id)) if commutative and all(
+                isinstance(ii, AutoDiffReverse) for ii in args) else args
+            key = (op,) + operands + tuple(sorted(kwargs.items()))
+            try:
+                new = _cse_cache[key]
+                if _profiler is not None:
+                    _profiler.cse_hits += 1
+                return new
+            except KeyError:
+                pass
+            except TypeError:
+                # unhashable operands such as arrays
+                return _build(op, func, args, kwargs)
+            new = _cse_cache[key] = _build(op, func, args, kwargs)
+            return new
+        return wrapper
+    return decorator
+
+def _profiled(section):
+    """
+    Decorator timing a function as a section of the active profile, see ADG4.profiler
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _profiler is None:
+                return func(*args, **kwargs)
+            return _profiler.call(section, func, args, kwargs)
+        return wrapper
+    return decorator
+
 class AutoDiffReverse():
     """
     A reverse automatic differentiation variable class.
     """
+    # Graphs can hold millions of nodes, so a node has no per-instance __dict__, children is a tuple
+    # (the shared empty tuple for a leaf) and the partial derivatives are only allocated by backprop
+    __slots__ = ('val', 'children', 'name', '_partial')
+
     def __init__(self,a, name=None):
         """
         AutoDiffReverse class constructor. 
@@ -65,19 +158,42 @@ class AutoDiffReverse():
         ---------
         """
         self.val= copy.deepcopy(a) # needed for np array reference management
-        self.children = []
-        self.has_backpropped = False
+        self.children = ()
         self.name = name
-        self._partial = {}
+        self._partial = None
+
+    @classmethod
+    def _node(cls, val, children):
+        """
+        Builds an intermediate node from a freshly computed value, which unlike a user input needs no copy
+        ---------
+        :param val: the value of the node
+        :param children: a tuple of (operand node, edge) pairs
+        ---------
+        """
+        new = cls.__new__(cls)
+        new.val = val
+        new.children = children
+        new.name = None
+        new._partial = None
+        return new
+
+    @property
+    def has_backpropped(self):
+        """
+        True once backprop has stored the partial derivatives of this node
+        """
+        return self._partial is not None
 
     def __repr__(self):
         """
         A print function for development purpose
         """
         if not self.name:
-            return f'AutoDiffReverse({self.val})'
-        return f'AutoDiffReverse({self.val}, name="{self.name}")'
+            return f'{type(self).__name__}({self.val})'
+        return f'{type(self).__name__}({self.val}, name="{self.name}")'
 
+    @_hash_consed('add', commutative=True)
     def __add__(self,other):
         """
         add function
@@ -86,15 +202,10 @@ class AutoDiffReverse():
         ------------
         output: A new AutoDiffReverse instance
         """
-        new=AutoDiffReverse(self.val)
-        
         try:
-            new.val+=other.val
-            new.children=[[self,1],[other,1]]
+            return type(self)._node(self.val + other.val, ((self, 1), (other, 1)))
         except AttributeError:
-            new.val+=other
-            new.children=[[self,1]]
-        return new
+            return type(self)._node(self.val + other, ((self, 1),))
 
     def __radd__(self,other):
         """
@@ -106,6 +217,7 @@ class AutoDiffReverse():
         """
         return self.__add__(other)
 
+    @_hash_consed('mul', commutative=True)
     def __mul__(self,other):
         """
         multiplication function
@@ -114,15 +226,10 @@ class AutoDiffReverse():
         ------------
         output: A new AutoDiffReverse instance
         """
-        new=AutoDiffReverse(self.val)
-        
         try:
-            new.val*=other.val
-            new.children=[[self,other.val],[other,self.val]]
+            return type(self)._node(self.val * other.val, ((self, other.val), (other, self.val)))
         except AttributeError:
-            new.val*=other
-            new.children=[[self,other]]
-        return new
+            return type(self)._node(self.val * other, ((self, other),))
 
     def __rmul__(self,other):
         """
@@ -134,41 +241,46 @@ class AutoDiffReverse():
         """
         return self.__mul__(other)
     
-    def backprop(self):
+    def backprop(self, retain_graph=True):
         """
-        back propogation function, which backprop the tree of partial derivatives formed by the chain rule
+        back propogation function, which backprop the tree of partial derivatives formed by the chain rule.
+        The graph is topologically sorted once, so every node's adjoint is accumulated exactly once
+        no matter how many paths lead to it.
+        -----------
+        :param retain_graph: if True, the partial derivatives with respect to every node of the graph are kept and
+                             the graph stays attached to this node. If False, only the partial derivatives with respect
+                             to the inputs (nodes without children) and the named nodes are kept, and this node drops
+                             its children, so the intermediate nodes can be freed once nothing else refers to them.
+                             The kept partial derivatives can still be queried with partial and der, but the node is
+                             marked as released: using it in a new expression, jacobian, vjp... raises a ValueError.
+                             An input (a node without children) has no graph to release and is left untouched.
         """
         # A back prop implementation that keeps all derivative accumulations
         # within this root node that calls .backprop()
-        partial = defaultdict(int)
-        
-        stack = [ (child_node, edge_value) for (child_node, edge_value) in self.children]
-        while stack:
-            # edge value is the derivative between the root node
-            # and this current node
-            node, edge_value = stack.pop()
-            # Update the partial derivative to add this current derivative value
-            partial[node] += edge_value
-            # Add each child to our stack
-            for child_node, child_edge_value in node.children:
-                # For each child, its derivative with respect to the root is
-                # (derivative root -> node) * (derivative node -> child_node)
-                stack.append((child_node, edge_value * child_edge_value))
-                
-        self._partial = dict(partial)
-        
+        partial = _accumulate(_topological_order([self]), {self: 1})
+        del partial[self]
+        # an input has no graph to release and stays usable
+        if not retain_graph and self.children:
+            partial = {kk: value for kk, value in partial.items() if kk.name is not None or not kk.children}
+            # None marks the node as released, _topological_order refuses to go through it
+            self.children = None
+            if _cse_cache is not None:
+                for key in [key for key, node in _cse_cache.items() if node is self]:
+                    del _cse_cache[key]
+        self._partial = partial
+
 
-    def partial(self,vv):
+    def partial(self,vv, retain_graph=True):
         """
         Returns partial derivative given variable vv
         -----------
         :param vv: a AutoDiffReverse istance, the partial derivative will be calcuated with respect to vari
+        :param retain_graph: passed to backprop when this is the first query, see backprop
         -----------
         :return: return the partial derivative
         """
         if not self.has_backpropped:
-            self.backprop()
-            self.has_backpropped = True
+            self.backprop(retain_graph)
         
         if vv in self._partial.keys():
             return self._partial[vv]
@@ -179,19 +291,75 @@ class AutoDiffReverse():
             raise KeyError('Function not dependent on input')
 
     @property
+    @_profiled('der')
     def der(self):
+        """
+        Returns the partial derivatives with respect to every named variable as a one row pandas DataFrame
+        """
         if not self.has_backpropped:
             self.backprop()
-            self.has_backpropped = True
 
-        keys=[]
-        for kk in self._partial.keys():
-            if not kk.name == None:
-               keys.append(kk)
+        # pandas is only imported when a DataFrame is asked for, it takes longer to import than the whole package
+        import pandas as pd
+        keys=[kk for kk in self._partial.keys() if kk.name is not None]
         der=pd.DataFrame([[self._partial[kk] for kk in keys]],index=[0],columns=[k.name for k in keys])
         return der
-        
+
     @classmethod
+    @_profiled('jacobian')
+    def jacobian(cls, v, wrt=None, as_frame=False):
+        """
+        Jacobian of the outputs v, assembled in one pass into a dense numpy array.
+        The graph shared by the outputs is sorted once. When every node holds a scalar, a single backward
+        sweep carries one adjoint vector per node (entry k for output k), otherwise each output gets
+        its own sweep over the shared order.
+        ---------------
+        v: a list of AutoDiffReverse instances
+        wrt: an optional list of AutoDiffReverse instances giving the columns. By default, every
+             named variable the outputs depend on, in the order they are first reached
+        as_frame: if True, return a pandas DataFrame with the variable names as columns instead
+        ---------------
+        return: a tuple (jacobian, names), jacobian is a numpy array of shape (len(v), len(wrt)) and
+                names is the list of column names. A DataFrame if as_frame is True
+        ---------------
+        Example:
+        jac, names = rev.AutoDiffReverse.jacobian([f1, f2])
+        """
+        order = _topological_order(v)
+        if wrt is None:
+            reached = {child_node for node in order for child_node, _ in node.children}
+            # reversed topological order lists the leaves in the order the depth first search found them
+            wrt = [node for node in reversed(order) if node.name is not None and node in reached]
+        if all(np.isscalar(node.val) for node in order):
+            # int64 adjoints would overflow on integer graphs, so those are seeded with Python ints (object
+            # arrays), which stay exact like partial does, and everything else with floats
+            exact = all(isinstance(node.val, (int, np.integer)) for node in order)
+            dtype = object if exact else float
+            unit = np.eye(len(v), dtype=dtype)
+            seeds = {}
+            for kk, ii in enumerate(v):
+                seeds[ii] = seeds[ii] + unit[kk] if ii in seeds else unit[kk]
+            adjoint = _accumulate(order, seeds)
+            zero = np.zeros(len(v), dtype=dtype)
+            rows = np.array([adjoint.get(kk, zero) for kk in wrt]).T.reshape(len(v), len(wrt))
+            if exact:
+                # back to int64 when every entry fits, object otherwise
+                rows = np.array(rows.tolist()).reshape(len(v), len(wrt))
+        else:
+            # entries may be arrays of different shapes, so they are kept as objects
+            rows = np.empty((len(v), len(wrt)), dtype=object)
+            for row, ii in enumerate(v):
+                adjoint = _accumulate(order, {ii: 1})
+                for col, kk in enumerate(wrt):
+                    rows[row, col] = adjoint.get(kk, 0)
+        names = [kk.name for kk in wrt]
+        if as_frame:
+            import pandas as pd
+            return pd.DataFrame(rows, columns=names)
+        return rows, names
+
+    @classmethod
+    @_profiled('vconvert')
     def vconvert(cls, v):
         """
         vectorize the output of the function from Rm to Rn
@@ -199,18 +367,12 @@ class AutoDiffReverse():
         v: a list of AutoDiffVector instances
         """
         vvector=np.array([ii.val for ii in v])
-#        vvector=vvector.reshape(len(vvector),1)
-        cols=[]
-        for ii in v:
-            cols=cols+list(ii.der.columns)
-        cols=set(cols)
-        jacobian=pd.DataFrame(columns=cols)
-        for nn,ii in enumerate(v):
-            jacobian=jacobian.append(ii.der)
-        jacobian=jacobian.fillna(0)
+        jacobian=cls.jacobian(v, as_frame=True)
+        jacobian.index=[0]*len(v)
         obj = type('obj', (object,), {'val' : vvector, 'der':jacobian})
         return obj
 
+    @_hash_consed('neg')
     def __neg__(self):
         """
         unary negative function
@@ -219,11 +381,9 @@ class AutoDiffReverse():
         ------------
         output: A new AutoDiffVector instance
         """
-        new=AutoDiffReverse(-self.val)
-        new.name=None
-        new.children=[[self,-1]]
-        return new
+        return type(self)._node(-self.val, ((self, -1),))
 
+    @_hash_consed('inv')
     def __inv__(self):
         """
         unary invert function. Invert for a variable x is defined as 1/x for its value and derivative
@@ -232,10 +392,7 @@ class AutoDiffReverse():
         ------------
         output: A new AutoDiffReverse instance
         """
-        new=AutoDiffReverse(1/self.val)
-        new.name=None
-        new.children=[[self,-1/(self.val)**2]]
-        return new
+        return type(self)._node(1/self.val, ((self, -1/(self.val)**2),))
     
     def __sub__(self,other):
         """
@@ -280,6 +437,7 @@ class AutoDiffReverse():
         """
         return other*self.__inv__()
 
+    @_hash_consed('pow')
     def __pow__(self,other):
         
         """
@@ -289,16 +447,13 @@ class AutoDiffReverse():
         ------------
         output: A new AutoDiffReverse instance
         """
-        new=AutoDiffReverse(self.val)
-        new.name=None
         try:
-            new.val**=other.val
-            new.children=[[self,other.val*self.val**(other.val-1)],[other,self.val**other.val*np.log(self.val)]]
-        except:
-            new.val**=other
-            new.children=[[self,other*self.val**(other-1)]]
-        return new
+            val = self.val**other.val
+            return type(self)._node(val, ((self, other.val*self.val**(other.val-1)), (other, val*np.log(self.val))))
+        except AttributeError:
+            return type(self)._node(self.val**other, ((self, other*self.val**(other-1)),))
 
+    @_hash_consed('rpow')
     def __rpow__(self,other):
         """
          reverse power function
@@ -307,11 +462,268 @@ class AutoDiffReverse():
          ------------
          output: A new AutoDiffReverse instance
         """
-        new=AutoDiffReverse(self.val)
-        new.name=None
-        new.val=other**self.val
-        new.children=[[self,other**self.val*np.log(other)]]
-        return new
+        val = other**self.val
+        return type(self)._node(val, ((self, val*np.log(other)),))
+
+def _unbroadcast(grad, shape):
+    """
+    Sums a gradient over the axes that broadcasting added or stretched, so that it gets back the given shape
+    """
+    if np.ndim(grad) == 0:
+        return grad
+    while np.ndim(grad) > len(shape):
+        grad = grad.sum(axis=0)
+    for axis, size in enumerate(shape):
+        if size == 1 and grad.shape[axis] != 1:
+            grad = grad.sum(axis=axis, keepdims=True)
+    return grad
+
+def _matmul_vjp(a, b, grad):
+    """
+    Vector-Jacobian product of a @ b for 1-D and 2-D operands, returns the gradients of a and b
+    """
+    a2 = a if a.ndim == 2 else a.reshape(1, -1)
+    b2 = b if b.ndim == 2 else b.reshape(-1, 1)
+    grad = np.broadcast_to(grad, (a2.shape[0], b2.shape[1])) if np.ndim(grad) == 0 else grad.reshape(a2.shape[0], b2.shape[1])
+    return (grad @ b2.T).reshape(a.shape), (a2.T @ grad).reshape(b.shape)
+
+class TensorReverse(AutoDiffReverse):
+    """
+    A reverse automatic differentiation variable holding a whole numpy array.
+    Every operation records its vector-Jacobian product, so broadcasting, sums and matrix products are
+    differentiated as array operations and one node replaces one AutoDiffReverse per entry.
+    The partial derivatives of a scalar output, e.g. sum_rv(...), have the shape of the variable.
+    For an array output they are the partial derivatives of the sum of its entries.
+    """
+    # numpy arrays hand their binary operators over to this class instead of looping over the entries
+    __array_ufunc__ = None
+    __slots__ = ()
+
+    def __init__(self, a, name=None):
+        """
+        TensorReverse class constructor.
+        ---------
+        Inputs:
+        :param a: the initial value of a variable, anything numpy can turn into an array
+        :param name: the name of the variable, should be a string, it is optional.
+        ---------
+        """
+        super().__init__(np.asarray(a, dtype=float), name)
+
+    def _binary(self, other, val, d_self, d_other):
+        """
+        Records an elementwise binary operation with local derivatives d_self and d_other
+        """
+        self_shape = np.shape(self.val)
+        children = ((self, lambda grad: _unbroadcast(grad * d_self, self_shape)),)
+        if isinstance(other, AutoDiffReverse):
+            other_shape = np.shape(other.val)
+            children += ((other, lambda grad: _unbroadcast(grad * d_other, other_shape)),)
+        return TensorReverse._node(np.asarray(val, dtype=float), children)
+
+    @_hash_consed('add', commutative=True)
+    def __add__(self, other):
+        other_val = other.val if isinstance(other, AutoDiffReverse) else other
+        return self._binary(other, self.val + other_val, 1., 1.)
+
+    def __radd__(self, other):
+        return self.__add__(other)
+
+    @_hash_consed('mul', commutative=True)
+    def __mul__(self, other):
+        other_val = other.val if isinstance(other, AutoDiffReverse) else other
+        return self._binary(other, self.val * other_val, other_val, self.val)
+
+    def __rmul__(self, other):
+        return self.__mul__(other)
+
+    def __rsub__(self, other):
+        return -self + other
+
+    def __rtruediv__(self, other):
+        return self.__inv__() * other
+
+    @_hash_consed('pow')
+    def __pow__(self, other):
+        other_val = other.val if isinstance(other, AutoDiffReverse) else other
+        val = self.val ** other_val
+        d_other = val * np.log(self.val) if isinstance(other, AutoDiffReverse) else 0.
+        return self._binary(other, val, other_val * self.val ** (other_val - 1), d_other)
+
+    @_hash_consed('rpow')
+    def __rpow__(self, other):
+        other_val = other.val if isinstance(other, AutoDiffReverse) else other
+        val = other_val ** self.val
+        d_other = self.val * other_val ** (self.val - 1) if isinstance(other, AutoDiffReverse) else 0.
+        return self._binary(other, val, val * np.log(other_val), d_other)
+
+    @_hash_consed('matmul')
+    def __matmul__(self, other):
+        a = self.val
+        b = other.val if isinstance(other, AutoDiffReverse) else np.asarray(other, dtype=float)
+        children = ((self, lambda grad: _matmul_vjp(a, b, grad)[0]),)
+        if isinstance(other, AutoDiffReverse):
+            children += ((other, lambda grad: _matmul_vjp(a, b, grad)[1]),)
+        return TensorReverse._node(np.asarray(a @ b, dtype=float), children)
+
+    @_hash_consed('rmatmul')
+    def __rmatmul__(self, other):
+        a = np.asarray(other, dtype=float)
+        b = self.val
+        return TensorReverse._node(np.asarray(a @ b, dtype=float), ((self, lambda grad: _matmul_vjp(a, b, grad)[1]),))
+
+def _children(node):
+    """
+    Iterator over the children of a node, which must not have been released by backprop(retain_graph=False)
+    """
+    if node.children is None:
+        raise ValueError(f'The graph below {node!r} was released by backprop(retain_graph=False), '
+                         'it can no longer be differentiated through. Use retain_graph=True to reuse it.')
+    return iter(node.children)
+
+@_profiled('topological_order')
+def _topological_order(roots):
+    """
+    Sort the graph below the given root nodes so that every node comes before its children
+    ---------------
+    roots: a list of AutoDiffReverse instances
+    ---------------
+    return: a list of AutoDiffReverse instances, each node appears once
+    """
+    # Iterative post-order depth first search, so deep graphs do not hit the recursion limit
+    visited = set()
+    order = []
+    for root in roots:
+        if root in visited:
+            continue
+        visited.add(root)
+        stack = [(root, _children(root))]
+        while stack:
+            node, children = stack[-1]
+            for child_node, _ in children:
+                if child_node not in visited:
+                    visited.add(child_node)
+                    stack.append((child_node, _children(child_node)))
+                    break
+            else:
+                stack.pop()
+                order.append(node)
+    order.reverse()
+    return order
+
+@_profiled('backprop')
+def _accumulate(order, seeds):
+    """
+    Sweep a topological order once and accumulate the adjoint of every node
+    ---------------
+    order: a list of AutoDiffReverse instances as returned by _topological_order
+    seeds: a dict mapping root nodes to their initial adjoints
+    ---------------
+    return: a dict mapping every reached node to its adjoint
+    """
+    adjoint = dict(seeds)
+    for node in order:
+        if node not in adjoint:
+            continue
+        node_adjoint = adjoint[node]
+        for child_node, edge_value in node.children:
+            # the derivative of the root with respect to child_node is
+            # (derivative root -> node) * (derivative node -> child_node),
+            # tensor operations store their vector-Jacobian product as a function instead
+            if callable(edge_value):
+                contribution = edge_value(node_adjoint)
+            else:
+                contribution = node_adjoint * edge_value
+            if child_node in adjoint:
+                adjoint[child_node] = adjoint[child_node] + contribution
+            else:
+                adjoint[child_node] = contribution
+    return adjoint
+
+def vjp(f, x, u):
+    """
+    Vector-Jacobian product u^T J(x) of f, computed with a single backward sweep whatever the number of outputs.
+    The outputs are seeded with the components of u instead of one output at a time.
+    ---------------
+    f: a function taking one AutoDiffReverse per input and returning an AutoDiffReverse or a list of them
+    x: a list of input values
+    u: the output weights, a list with one entry per output, or a number for a single output
+    ---------------
+    return: a tuple (value, product). value is a numpy array for a list of outputs, product has one entry per input
+    ---------------
+    Example:
+    val, prod = rev.vjp(lambda x, y: [x*y, rev.sin_rv(x)], [1., 2.], [1., 0.5])
+    """
+    inputs = [AutoDiffReverse(xx) for xx in x]
+    out = f(*inputs)
+    single = not isinstance(out, (list, tuple))
+    outs, weights = ([out], [u]) if single else (list(out), list(u))
+    seeds = {}
+    for ii, ww in zip(outs, weights):
+        # outputs that do not depend on any input are plain numbers
+        if isinstance(ii, AutoDiffReverse):
+            seeds[ii] = seeds[ii] + ww if ii in seeds else ww
+    adjoint = _accumulate(_topological_order(list(seeds)), seeds)
+    vals = [ii.val if isinstance(ii, AutoDiffReverse) else ii for ii in outs]
+    return vals[0] if single else np.array(vals), np.array([adjoint.get(ii, 0.) for ii in inputs])
+
+def _split(x):
+    """
+    Returns the value and the tangent of a number produced by a forward-over-reverse sweep
+    """
+    if isinstance(x, AutoDiffVector):
+        return x.val, x.der
+    return x, 0.
+
+def _input_adjoints(f, inputs):
+    """
+    Runs a scalar function f on the AutoDiffReverse inputs and one forward-over-reverse sweep, returns the value
+    and the (adjoint, tangent) pair of every input. An output that does not depend on any input is a plain number,
+    every input then gets a zero adjoint
+    """
+    out = f(*inputs)
+    if not isinstance(out, AutoDiffReverse):
+        return out, [(0., 0.) for _ in inputs]
+    adjoint = _accumulate(_topological_order([out]), {out: 1})
+    return _split(out.val)[0], [_split(adjoint.get(ii, 0.)) for ii in inputs]
+
+def hvp(f, x, v):
+    """
+    Hessian-vector product H(x) v of a scalar function f, computed forward-over-reverse: every input holds
+    a forward mode AutoDiffVector seeded with its component of v, so the single reverse sweep carries
+    the tangent of the gradient in the direction v along with the gradient itself.
+    ---------------
+    f: a function taking one AutoDiffReverse per input and returning an AutoDiffReverse
+    x: a list of input values
+    v: a list with the direction, one entry per input
+    ---------------
+    return: a tuple (value, gradient, product), the gradient and the product are numpy arrays
+    ---------------
+    Example:
+    val, grad, hv = rev.hvp(lambda x, y: x**2*y, [1., 2.], [1., 0.])
+    """
+    val, grads = _input_adjoints(f, [AutoDiffReverse(AutoDiffVector(xx, vv)) for xx, vv in zip(x, v)])
+    return val, np.array([gg[0] for gg in grads], dtype=float), np.array([gg[1] for gg in grads], dtype=float)
+
+def hessian(f, x):
+    """
+    Full Hessian of a scalar function f, computed forward-over-reverse in a single reverse sweep whose
+    tangents carry one direction per input (the unit seeds of gen_vars), so it costs about n Hessian-vector
+    products. The upper triangle is mirrored only to make the result exactly symmetric. For large sparse
+    Hessians, sparsity.sparse_hessian uses the symmetry to carry far fewer directions.
+    ---------------
+    f: a function taking one AutoDiffReverse per input and returning an AutoDiffReverse
+    x: a list of input values
+    ---------------
+    return: a tuple (value, gradient, hessian), numpy arrays of shape (n,) and (n, n) for the last two
+    """
+    val, grads = _input_adjoints(f, [AutoDiffReverse(ii) for ii in gen_vars(x)])
+    n = len(grads)
+    grad = np.zeros(n)
+    rows = np.zeros((n, n))
+    for ii, gg in enumerate(grads):
+        grad[ii], rows[ii] = gg
+    return val, grad, np.triu(rows) + np.triu(rows, 1).T
 
 """
 Below is a set of elementary functions for AutoDiffReverse. The calculation of them are self-evident.
@@ -320,81 +732,94 @@ Input: If not particularly specified, should be a AutoDiffReverse instance
 -----------
 Return: return a new AutoDiffReverse instance after the calculation
 """
+def _fused(kernel, x):
+  """
+  Builds the node of an elementary function with a kernel of kernels.py, which evaluates the value
+  and the local derivative stored on the edge together
+  """
+  val, der = kernel(x.val)
+  return type(x)._node(val, ((x, der),))
+
+@_hash_consed('sin')
 def sin_rv(x):
-  new=AutoDiffReverse(np.sin(x.val))
-  new.name=None
-  new.children=[[x,np.cos(x.val)]]
-  return new
+  return _fused(kernels.sin, x)
 
+@_hash_consed('cos')
 def cos_rv(x):
-  new=AutoDiffReverse(np.cos(x.val))
-  new.name=None
-  new.children=[[x,-np.sin(x.val)]]
-  return new
+  return _fused(kernels.cos, x)
 
+@_hash_consed('tan')
 def tan_rv(x):
-  return sin_rv(x)/cos_rv(x)
+  return _fused(kernels.tan, x)
 
+@_hash_consed('arcsin')
 def arcsin_rv(x):
-  new=AutoDiffReverse(np.arcsin(x.val))
-  new.name=None
-  new.children=[[x,1 / (1 - x.val ** 2) ** 0.5]]
-  return new
+  return _fused(kernels.arcsin, x)
 
+@_hash_consed('arccos')
 def arccos_rv(x):
-  new=AutoDiffReverse(np.arccos(x.val))
-  new.name=None
-  new.children=[[x,-1 / (1 - x.val ** 2) ** 0.5]]
-  return new
+  return _fused(kernels.arccos, x)
 
+@_hash_consed('arctan')
 def arctan_rv(x):
-  new=AutoDiffReverse(np.arctan(x.val))
-  new.name=None
-  new.children=[[x,-1 / (1 - x.val ** 2) ** 0.5]]
-  return new
+  return _fused(kernels.arctan, x)
 
 def expa_rv(a,x):
     
     return a**x
 
+@_hash_consed('exp')
 def exp_rv(x):
-    return expa_rv(np.exp(1),x)
+    return _fused(kernels.exp, x)
 
+@_hash_consed('loga')
 def loga_rv(a,x):
     """
     Input `a` should be a scaler variable such as a int or float. `a` is an arbitrary base for the calculation.
     """
-    new=AutoDiffReverse(np.log(x.val)/np.log(a))
-    new.name=None
-    new.children=[[x,1 / (x.val * np.log(a)) ]]
-    return new
+    val, der = kernels.loga(a, x.val)
+    return type(x)._node(val, ((x, der),))
 
+@_hash_consed('log')
 def log_rv(x):
-      return loga_rv(np.exp(1),x)
+      return _fused(kernels.log, x)
 
+@_hash_consed('sinh')
 def sinh_rv(x):
-  new=AutoDiffReverse(np.sinh(x.val))
-  new.name=None
-  new.children=[[x,np.cosh(x.val)]]
-  return new
+  return _fused(kernels.sinh, x)
 
+@_hash_consed('cosh')
 def cosh_rv(x):
-  new=AutoDiffReverse(np.cosh(x.val))
-  new.name=None
-  new.children=[[x,np.sinh(x.val)]]
-  return new
+  return _fused(kernels.cosh, x)
 
+@_hash_consed('tanh')
 def tanh_rv(x):
-  new=AutoDiffReverse(np.tanh(x.val))
-  new.name=None
-  new.children=[[x,(np.cosh(x.val) ** 2 - np.sinh(x.val) ** 2) / (np.cosh(x.val) ** 2)]]
-  return new
+  return _fused(kernels.tanh, x)
 
+@_hash_consed('logistic')
 def logistic_rv(x):
     """
     We define logistic function as 1/(1+exp(-x))
     """
-    return 1/(1+exp_rv(-x))
+    return _fused(kernels.logistic, x)
 
 def sqrt_rv(x):
       return x**0.5
+
+@_hash_consed('sum')
+def sum_rv(x, axis=None):
+    """
+    Sum of the entries of a TensorReverse, over all axes or the given axis
+    """
+    shape = np.shape(x.val)
+    if axis is None:
+        vjp = lambda grad: np.broadcast_to(grad, shape)
+    else:
+        vjp = lambda grad: np.broadcast_to(np.expand_dims(grad, axis), shape)
+    return TensorReverse._node(np.asarray(np.sum(x.val, axis=axis), dtype=float), ((x, vjp),))
+
+def dot_rv(a, b):
+    """
+    Matrix product a @ b of 1-D or 2-D operands, at least one of them a TensorReverse
+    """
+    return a @ b
@@ -0,0 +1,256 @@
+import numpy as np
+from .ad import AutoDiffVector, SparseTangent, gen_vars
+from .reverse import AutoDiffReverse, _input_adjoints
+
+"""
+sparsity.py: Compressed forward mode Jacobians for functions with sparse Jacobians.
+
+Forward mode needs one seed direction per input to build a full Jacobian. When the Jacobian is mostly
+zeros, inputs that never appear in the same output (structurally orthogonal columns) can share a seed.
+The work is done in three steps:
+    1. jacobian_sparsity runs the function once with sparse tangents and records which inputs every output depends on
+    2. color_columns groups the columns so that no two columns of a group share a row
+    3. sparse_jacobian seeds one direction per group and scatters the compressed result back
+Hessians follow the same three steps with hessian_sparsity, star_color and sparse_hessian, computed
+forward-over-reverse. A Hessian is symmetric, so every off-diagonal entry can be read either from its row or
+from its column: star_color only needs one of the two to be recoverable, which allows far fewer colors than
+color_columns, e.g. 2 instead of n for an arrowhead matrix.
+
+NOTES:
+
+        import ADG4.sparsity as sp
+        def residual(*u):
+            n = len(u)
+            return [u[ii - 1] - 2 * u[ii] + u[(ii + 1) % n] for ii in range(n)]
+        val, jac = sp.sparse_jacobian(residual, np.ones(10000))
+        ##jac is in compressed sparse row format, jac.toarray() gives the dense matrix
+        ##and jac.tocsr() a scipy.sparse.csr_matrix when scipy is installed
+        import ADG4.reverse as rev
+        val, grad, hess = sp.sparse_hessian(lambda *u: sum(rev.exp_rv(u[0] * ii) for ii in u), np.ones(1000))
+
+"""
+
+
+class CSRMatrix():
+    """
+    A sparse matrix in compressed sparse row format, laid out like scipy.sparse.csr_matrix:
+    the column indices of row i are indices[indptr[i]:indptr[i+1]] and their values are the same slice of data.
+    """
+    def __init__(self, data, indices, indptr, shape):
+        """
+        CSRMatrix class constructor.
+        :param data: the nonzero values, row by row
+        :param indices: the column index of every value
+        :param indptr: where every row starts in data and indices, of length shape[0] + 1
+        :param shape: a tuple (number of rows, number of columns)
+        """
+        self.data = np.asarray(data)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.shape = tuple(shape)
+
+    def __repr__(self):
+        return f'CSRMatrix(shape={self.shape}, nnz={self.nnz})'
+
+    @property
+    def nnz(self):
+        return len(self.indices)
+
+    def rows(self):
+        """
+        Returns the row index of every stored value
+        """
+        return np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+
+    def toarray(self):
+        """
+        Returns the dense matrix as a numpy array
+        """
+        dense = np.zeros(self.shape, dtype=self.data.dtype)
+        dense[self.rows(), self.indices] = self.data
+        return dense
+
+    def tocsr(self):
+        """
+        Returns a scipy.sparse.csr_matrix, scipy is only needed for this conversion
+        """
+        from scipy.sparse import csr_matrix
+        return csr_matrix((self.data, self.indices, self.indptr), shape=self.shape)
+
+
+def _outputs(out):
+    return list(out) if isinstance(out, (list, tuple)) else [out]
+
+
+def jacobian_sparsity(f, x):
+    """
+    Detects which inputs every output depends on, by running f once with sparse tangents
+    ---------------
+    f: a function taking one AutoDiffVector per input and returning an AutoDiffVector or a list of them
+    x: a list of input values
+    ---------------
+    return: a CSRMatrix of booleans, True where the Jacobian can be nonzero
+    """
+    outs = _outputs(f(*gen_vars(x, sparse=True)))
+    indices = []
+    indptr = [0]
+    for ii in outs:
+        der = ii.der if isinstance(ii, AutoDiffVector) else None
+        if isinstance(der, SparseTangent):
+            indices.extend(sorted(der.entries))
+        elif der is not None:
+            # a dense derivative, for example from mixing in a variable not created by gen_vars
+            indices.extend(np.flatnonzero(der).tolist())
+        indptr.append(len(indices))
+    return CSRMatrix(np.ones(len(indices), dtype=bool), indices, indptr, (len(outs), len(x)))
+
+
+def color_columns(pattern):
+    """
+    Greedy coloring of the columns of a sparsity pattern. Two columns get different colors whenever they
+    have a nonzero in the same row, so all the columns of one color can share a forward mode seed.
+    The columns are visited from the most to the least connected, which usually needs fewer colors.
+    ---------------
+    pattern: a CSRMatrix as returned by jacobian_sparsity
+    ---------------
+    return: a numpy array with the color of every column, the colors are 0, 1, ..., ncolors - 1
+    """
+    nrows, ncols = pattern.shape
+    row_cols = [pattern.indices[pattern.indptr[ii]:pattern.indptr[ii + 1]] for ii in range(nrows)]
+    col_rows = [[] for _ in range(ncols)]
+    for ii, cols in enumerate(row_cols):
+        for jj in cols:
+            col_rows[jj].append(ii)
+    degree = np.array([sum(len(row_cols[ii]) for ii in rows) for rows in col_rows])
+    colors = np.full(ncols, -1, dtype=np.int64)
+    for jj in np.argsort(-degree, kind='stable'):
+        forbidden = {colors[kk] for ii in col_rows[jj] for kk in row_cols[ii]}
+        color = 0
+        while color in forbidden:
+            color += 1
+        colors[jj] = color
+    return colors
+
+
+def sparse_jacobian(f, x, pattern=None, colors=None):
+    """
+    Jacobian of f at x in compressed sparse row format, computed with one forward mode direction per color
+    instead of one per input. All the directions are carried by a single evaluation of f.
+    ---------------
+    f: a function taking one AutoDiffVector per input and returning an AutoDiffVector or a list of them
+    x: a list of input values
+    pattern: an optional CSRMatrix from jacobian_sparsity, detected when not given
+    colors: an optional column coloring from color_columns, computed when not given
+    ---------------
+    return: a tuple (values, jacobian), values is a numpy array and jacobian a CSRMatrix
+    """
+    if pattern is None:
+        pattern = jacobian_sparsity(f, x)
+    if colors is None:
+        colors = color_columns(pattern)
+    ncolors = int(colors.max()) + 1 if len(colors) else 0
+    seeds = np.zeros((len(x), ncolors))
+    seeds[np.arange(len(x)), colors] = 1
+    outs = _outputs(f(*[AutoDiffVector(xx, ss) for xx, ss in zip(x, seeds)]))
+    vals = np.array([ii.val if isinstance(ii, AutoDiffVector) else ii for ii in outs])
+    compressed = np.array([np.broadcast_to(ii.der, ncolors) if isinstance(ii, AutoDiffVector) else np.zeros(ncolors)
+                           for ii in outs]).reshape(len(outs), ncolors)
+    data = compressed[pattern.rows(), colors[pattern.indices]]
+    return vals, CSRMatrix(data, pattern.indices, pattern.indptr, pattern.shape)
+
+
+def hessian_sparsity(f, x):
+    """
+    Detects which entries of the Hessian of a scalar function can be nonzero, by running f once
+    forward-over-reverse with sparse tangents
+    ---------------
+    f: a function taking one AutoDiffReverse per input and returning an AutoDiffReverse
+    x: a list of input values
+    ---------------
+    return: a symmetric CSRMatrix of booleans, True where the Hessian can be nonzero
+    """
+    _, adjoints = _input_adjoints(f, [AutoDiffReverse(ii) for ii in gen_vars(x, sparse=True)])
+    row_cols = [set() for _ in x]
+    for ii, (_, der) in enumerate(adjoints):
+        if isinstance(der, SparseTangent):
+            for jj in der.entries:
+                row_cols[ii].add(jj)
+                row_cols[jj].add(ii)
+    indices = []
+    indptr = [0]
+    for cols in row_cols:
+        indices.extend(sorted(cols))
+        indptr.append(len(indices))
+    return CSRMatrix(np.ones(len(indices), dtype=bool), indices, indptr, (len(x), len(x)))
+
+
+def star_color(pattern):
+    """
+    Greedy star coloring of a symmetric sparsity pattern: adjacent columns get different colors and every
+    path through four columns uses at least three colors. Then for every nonzero (i, j), column j is the only
+    one of its color in row i or column i is the only one of its color in row j, so the whole Hessian can be
+    read back from one forward-over-reverse direction per color.
+    The columns are visited from the most to the least connected, which usually needs fewer colors.
+    ---------------
+    pattern: a symmetric CSRMatrix as returned by hessian_sparsity
+    ---------------
+    return: a numpy array with the color of every column, the colors are 0, 1, ..., ncolors - 1
+    """
+    n = pattern.shape[0]
+    adjacent = [[jj for jj in pattern.indices[pattern.indptr[ii]:pattern.indptr[ii + 1]] if jj != ii]
+                for ii in range(n)]
+    degree = np.array([len(ii) for ii in adjacent])
+    colors = np.full(n, -1, dtype=np.int64)
+    for vv in np.argsort(-degree, kind='stable'):
+        forbidden = set()
+        for ww in adjacent[vv]:
+            if colors[ww] >= 0:
+                forbidden.add(colors[ww])
+            for xx in adjacent[ww]:
+                if xx == vv or colors[xx] < 0:
+                    continue
+                if colors[ww] < 0:
+                    # v - w - x with w uncolored: v and x must differ, or w could not be colored later
+                    forbidden.add(colors[xx])
+                elif any(yy != ww and colors[yy] == colors[ww] for yy in adjacent[xx]):
+                    # v - w - x - y would be a path colored with two colors only
+                    forbidden.add(colors[xx])
+        color = 0
+        while color in forbidden:
+            color += 1
+        colors[vv] = color
+    return colors
+
+
+def sparse_hessian(f, x, pattern=None, colors=None):
+    """
+    Hessian of a scalar function f at x in compressed sparse row format, computed forward-over-reverse with
+    one tangent direction per color of a star coloring instead of one per input. All the directions are
+    carried by a single reverse sweep. Every off-diagonal entry is read from its row when its column is the
+    only one of its color there, and from the symmetric entry otherwise.
+    ---------------
+    f: a function taking one AutoDiffReverse per input and returning an AutoDiffReverse
+    x: a list of input values
+    pattern: an optional CSRMatrix from hessian_sparsity, detected when not given
+    colors: an optional star coloring from star_color, computed when not given
+    ---------------
+    return: a tuple (value, gradient, hessian), the gradient is a numpy array and hessian a CSRMatrix
+    """
+    if pattern is None:
+        pattern = hessian_sparsity(f, x)
+    if colors is None:
+        colors = star_color(pattern)
+    n = len(x)
+    ncolors = int(colors.max()) + 1 if n else 0
+    seeds = np.zeros((n, ncolors))
+    seeds[np.arange(n), colors] = 1
+    val, adjoints = _input_adjoints(f, [AutoDiffReverse(AutoDiffVector(xx, ss)) for xx, ss in zip(x, seeds)])
+    grad = np.array([val for val, _ in adjoints], dtype=float)
+    compressed = np.array([np.broadcast_to(der, ncolors) for _, der in adjoints]).reshape(n, ncolors)
+    rows, cols = pattern.rows(), pattern.indices
+    # how many columns of every color row i has, an entry is read from its row when this is 1
+    counts = np.zeros((n, ncolors), dtype=np.int64)
+    np.add.at(counts, (rows, colors[cols]), 1)
+    direct = counts[rows, colors[cols]] == 1
+    data = np.where(direct, compressed[rows, colors[cols]], compressed[cols, colors[rows]])
+    return val, grad, CSRMatrix(data, pattern.indices, pattern.indptr, pattern.shape)
@@ -0,0 +1,558 @@
+import json
+import math
+import sys
+from array import array
+
+import numpy as np
+
+"""
+tape.py: Automatic Differentiation for Python with reverse mode recorded on a flat tape.
+
+Instead of one Python object per node holding lists of children, every operation is appended
+to a Wengert tape made of contiguous typed arrays (op codes, parent indices, constants, values
+and local partials). The backward pass is a single loop over those arrays.
+Only scalar values are supported.
+
+
+See the examples below for some simple and advanced uses.
+
+NOTES:
+
+        ##import the tape module
+        import ADG4.tape as tp
+        tape = tp.Tape()
+        x = tape.var(3, name='x')
+        y = tape.var(4, name='y')
+
+        f = x**y + tp.sin_tp(x)
+        print(f.val, f.partial(x), f.partial(y))
+        ##gradient with respect to all inputs, in the order they were created
+        print(f.gradient(), tape.names)
+
+        ##trace a function once and replay it at new inputs
+        rosen = tp.trace(lambda x, y: (1 - x)**2 + 100*(y - x**2)**2, [0., 0.])
+        val, grad = rosen.value_and_grad([0.5, 0.3])
+
+        ##save the trace, other processes memory-map it and replay it without tracing again
+        rosen.save('rosen.adg4')
+        rosen = tp.load('rosen.adg4')
+
+"""
+
+# Op codes recorded on the tape. Ops ending with C take a constant operand from the consts array.
+(_INPUT, _CONST, _ADD, _SUB, _MUL, _DIV, _POW, _NEG, _ADDC, _MULC, _RSUBC, _RDIVC, _POWC, _RPOWC,
+ _SIN, _COS, _TAN, _ARCSIN, _ARCCOS, _ARCTAN, _EXP, _LOG, _SINH, _COSH, _TANH, _LOGISTIC, _SQRT) = range(27)
+
+OP_NAMES = ('input', 'const', 'add', 'sub', 'mul', 'div', 'pow', 'neg', 'addc', 'mulc', 'rsubc', 'rdivc',
+            'powc', 'rpowc', 'sin', 'cos', 'tan', 'arcsin', 'arccos', 'arctan', 'exp', 'log', 'sinh', 'cosh',
+            'tanh', 'logistic', 'sqrt')
+
+
+def _pow(a, b, c):
+    val = math.pow(a, b)
+    return val, b * math.pow(a, b - 1), val * math.log(a) if a > 0 else math.nan
+
+
+def _rpowc(a, b, c):
+    val = math.pow(c, a)
+    return val, val * math.log(c), 0.
+
+
+def _tan(a, b, c):
+    val = math.tan(a)
+    return val, 1. + val * val, 0.
+
+
+def _exp(a, b, c):
+    val = math.exp(a)
+    return val, val, 0.
+
+
+def _tanh(a, b, c):
+    val = math.tanh(a)
+    return val, 1. - val * val, 0.
+
+
+def _logistic(a, b, c):
+    # evaluate on the side that cannot overflow
+    if a >= 0:
+        val = 1. / (1. + math.exp(-a))
+    else:
+        e = math.exp(a)
+        val = e / (1. + e)
+    return val, val * (1. - val), 0.
+
+
+def _sqrt(a, b, c):
+    val = math.sqrt(a)
+    return val, 0.5 / val, 0.
+
+
+"""
+Local kernels for every op code. Each takes the values of the two parents and the constant
+operand and returns (value, partial with respect to parent 0, partial with respect to parent 1).
+"""
+_KERNELS = (
+    None,
+    lambda a, b, c: (c, 0., 0.),
+    lambda a, b, c: (a + b, 1., 1.),
+    lambda a, b, c: (a - b, 1., -1.),
+    lambda a, b, c: (a * b, b, a),
+    lambda a, b, c: (a / b, 1. / b, -a / (b * b)),
+    _pow,
+    lambda a, b, c: (-a, -1., 0.),
+    lambda a, b, c: (a + c, 1., 0.),
+    lambda a, b, c: (a * c, c, 0.),
+    lambda a, b, c: (c - a, -1., 0.),
+    lambda a, b, c: (c / a, -c / (a * a), 0.),
+    lambda a, b, c: (math.pow(a, c), c * math.pow(a, c - 1), 0.),
+    _rpowc,
+    lambda a, b, c: (math.sin(a), math.cos(a), 0.),
+    lambda a, b, c: (math.cos(a), -math.sin(a), 0.),
+    _tan,
+    lambda a, b, c: (math.asin(a), 1. / math.sqrt(1. - a * a), 0.),
+    lambda a, b, c: (math.acos(a), -1. / math.sqrt(1. - a * a), 0.),
+    lambda a, b, c: (math.atan(a), 1. / (1. + a * a), 0.),
+    _exp,
+    lambda a, b, c: (math.log(a), 1. / a, 0.),
+    lambda a, b, c: (math.sinh(a), math.cosh(a), 0.),
+    lambda a, b, c: (math.cosh(a), math.sinh(a), 0.),
+    _tanh,
+    _logistic,
+    _sqrt,
+)
+
+
+def _sweep(out, arg0, arg1, partial0, partial1, seed=1.):
+    """
+    Single backward loop over the tape
+    ---------------
+    out: index of the output entry the sweep starts from
+    arg0, arg1: parent indices of every entry, -1 when there is no parent
+    partial0, partial1: local partial derivatives of every entry with respect to its parents
+    seed: the adjoint of the output
+    ---------------
+    return: an array('d') with the adjoint of every entry up to out
+    """
+    adjoint = array('d', bytes(8 * (out + 1)))
+    adjoint[out] = seed
+    for kk in range(out, -1, -1):
+        a = adjoint[kk]
+        if a == 0.:
+            continue
+        ii = arg0[kk]
+        if ii >= 0:
+            adjoint[ii] += a * partial0[kk]
+        ii = arg1[kk]
+        if ii >= 0:
+            adjoint[ii] += a * partial1[kk]
+    return adjoint
+
+
+class Tape():
+    """
+    A Wengert tape that records reverse mode operations in contiguous arrays.
+    """
+    def __init__(self):
+        """
+        Tape class constructor, creates an empty tape.
+        """
+        self.ops = array('b')
+        self.arg0 = array('q')
+        self.arg1 = array('q')
+        self.consts = array('d')
+        self.vals = array('d')
+        self.partial0 = array('d')
+        self.partial1 = array('d')
+        self.inputs = []
+        self.names = []
+        # (index, adjoints) of the last backward sweep
+        self._last_sweep = (-1, None)
+
+    def __len__(self):
+        return len(self.ops)
+
+    def var(self, a, name=None):
+        """
+        Records an independent variable on the tape
+        ---------
+        :param a: the initial value of the variable, a int or float
+        :param name: the name of the variable, should be a string, it is optional.
+        ---------
+        :return: a TapeVar instance
+        """
+        idx = self._record(_INPUT, -1, -1, 0., float(a), 0., 0.)
+        self.inputs.append(idx)
+        self.names.append(name)
+        return TapeVar(self, idx)
+
+    def const(self, c):
+        """
+        Records a constant on the tape, for example a function output that does not depend on any input
+        """
+        return TapeVar(self, self._record(_CONST, -1, -1, float(c), float(c), 0., 0.))
+
+    def _record(self, op, i, j, c, val, d0, d1):
+        self.ops.append(op)
+        self.arg0.append(i)
+        self.arg1.append(j)
+        self.consts.append(c)
+        self.vals.append(val)
+        self.partial0.append(d0)
+        self.partial1.append(d1)
+        return len(self.vals) - 1
+
+    def _apply(self, op, i, j=-1, c=0.):
+        """
+        Evaluates op on the entries i and j and the constant c and records the result
+        """
+        val, d0, d1 = _KERNELS[op](self.vals[i], self.vals[j] if j >= 0 else 0., c)
+        return TapeVar(self, self._record(op, i, j, c, val, d0, d1))
+
+    def backward(self, idx):
+        """
+        Runs the backward sweep from entry idx. Only the last sweep is cached (the tape is append only, so it
+        stays valid): repeated queries on one output are free, and the memory held stays one adjoint array
+        instead of one per output ever queried
+        ---------
+        :return: an array('d') with the adjoint of every entry up to idx
+        """
+        if self._last_sweep[0] != idx:
+            self._last_sweep = (idx, _sweep(idx, self.arg0, self.arg1, self.partial0, self.partial1))
+        return self._last_sweep[1]
+
+
+class TapeVar():
+    """
+    A handle to one entry of a Tape. It supports the same operators as AutoDiffReverse.
+    """
+    __slots__ = ('tape', 'idx')
+
+    def __init__(self, tape, idx):
+        self.tape = tape
+        self.idx = idx
+
+    @property
+    def val(self):
+        return self.tape.vals[self.idx]
+
+    def __repr__(self):
+        return f'TapeVar({self.val})'
+
+    def _binary(self, other, op, const_op, const):
+        """
+        Records op if other is a TapeVar, otherwise const_op with the constant operand const
+        """
+        if isinstance(other, TapeVar):
+            if other.tape is not self.tape:
+                raise ValueError('Variables are recorded on different tapes')
+            return self.tape._apply(op, self.idx, other.idx)
+        return self.tape._apply(const_op, self.idx, -1, float(const))
+
+    def __add__(self, other):
+        return self._binary(other, _ADD, _ADDC, other)
+
+    def __radd__(self, other):
+        return self.tape._apply(_ADDC, self.idx, -1, float(other))
+
+    def __sub__(self, other):
+        if isinstance(other, TapeVar):
+            return self._binary(other, _SUB, _ADDC, 0.)
+        return self.tape._apply(_ADDC, self.idx, -1, -float(other))
+
+    def __rsub__(self, other):
+        return self.tape._apply(_RSUBC, self.idx, -1, float(other))
+
+    def __mul__(self, other):
+        return self._binary(other, _MUL, _MULC, other)
+
+    def __rmul__(self, other):
+        return self.tape._apply(_MULC, self.idx, -1, float(other))
+
+    def __truediv__(self, other):
+        if isinstance(other, TapeVar):
+            return self._binary(other, _DIV, _MULC, 0.)
+        return self.tape._apply(_MULC, self.idx, -1, 1. / other)
+
+    def __rtruediv__(self, other):
+        return self.tape._apply(_RDIVC, self.idx, -1, float(other))
+
+    def __pow__(self, other):
+        return self._binary(other, _POW, _POWC, other)
+
+    def __rpow__(self, other):
+        return self.tape._apply(_RPOWC, self.idx, -1, float(other))
+
+    def __neg__(self):
+        return self.tape._apply(_NEG, self.idx)
+
+    def backprop(self):
+        """
+        back propogation function, sweeps the tape backward once from this entry
+        """
+        self.tape.backward(self.idx)
+
+    def partial(self, vv):
+        """
+        Returns partial derivative given variable vv
+        -----------
+        :param vv: a TapeVar istance, the partial derivative will be calcuated with respect to vv
+        -----------
+        :return: return the partial derivative, 0 if this entry does not depend on vv
+        """
+        if vv.tape is not self.tape:
+            raise ValueError('Variables are recorded on different tapes')
+        if vv.idx > self.idx:
+            return 0.
+        return self.tape.backward(self.idx)[vv.idx]
+
+    def gradient(self):
+        """
+        Returns the partial derivatives with respect to every input of the tape, in the order
+        the inputs were created (see Tape.names)
+        """
+        adjoint = self.tape.backward(self.idx)
+        return np.array([adjoint[ii] if ii <= self.idx else 0. for ii in self.tape.inputs])
+
+
+class CompiledFunction():
+    """
+    A function traced once onto a tape. Values and gradients at new inputs are computed by
+    replaying the recorded ops into preallocated buffers, without running the Python function,
+    the operator dispatch or allocating any TapeVar again.
+    The trace is only valid as long as the function takes the same branches at the new inputs.
+    """
+    def __init__(self, ops, arg0, arg1, consts, inputs, outputs, names=None, output_names=None):
+        """
+        CompiledFunction class constructor, usually called through trace or load.
+        ---------
+        :param ops, arg0, arg1, consts: the recorded op codes, parent indices and constants,
+                                        typed arrays or numpy arrays such as the memory maps of load
+        :param inputs: tape indices of the inputs, in the order the function takes them
+        :param outputs: tape indices of the outputs
+        :param names: optional names of the inputs
+        :param output_names: optional names of the outputs
+        ---------
+        """
+        self.ops = ops
+        self.arg0 = arg0
+        self.arg1 = arg1
+        self.consts = consts
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.names = list(names) if names is not None else [None] * len(self.inputs)
+        self.output_names = list(output_names) if output_names is not None else [None] * len(self.outputs)
+        self._vals = array('d', bytes(8 * len(ops)))
+        self._partial0 = array('d', bytes(8 * len(ops)))
+        self._partial1 = array('d', bytes(8 * len(ops)))
+
+    def __len__(self):
+        return len(self.ops)
+
+    def _forward(self, x):
+        """
+        Replays the tape at the inputs x, filling the value and local partial buffers
+        """
+        if len(x) != len(self.inputs):
+            raise ValueError(f'Expected {len(self.inputs)} inputs, got {len(x)}')
+        vals, partial0, partial1 = self._vals, self._partial0, self._partial1
+        for ii, value in zip(self.inputs, x):
+            vals[ii] = value
+        kernels = _KERNELS
+        records = zip(memoryview(self.ops), memoryview(self.arg0), memoryview(self.arg1), memoryview(self.consts))
+        for kk, (op, i, j, c) in enumerate(records):
+            if op == _INPUT:
+                continue
+            vals[kk], partial0[kk], partial1[kk] = kernels[op](vals[i], vals[j] if j >= 0 else 0., c)
+
+    def __call__(self, x):
+        """
+        Returns the value of the function at x, a float for a single output and a numpy array otherwise
+        """
+        self._forward(x)
+        if len(self.outputs) == 1:
+            return self._vals[self.outputs[0]]
+        return np.array([self._vals[ii] for ii in self.outputs])
+
+    def jacobian(self, x):
+        """
+        Returns the values and the Jacobian at x, one backward sweep per output
+        ---------
+        :return: a tuple (values, jacobian), numpy arrays of shape (m,) and (m, n)
+        """
+        self._forward(x)
+        jacobian = np.zeros((len(self.outputs), len(self.inputs)))
+        # indexing a memoryview gives Python ints for typed arrays and numpy arrays alike
+        arg0, arg1 = memoryview(self.arg0), memoryview(self.arg1)
+        for row, out in enumerate(self.outputs):
+            adjoint = _sweep(out, arg0, arg1, self._partial0, self._partial1)
+            jacobian[row] = [adjoint[ii] if ii <= out else 0. for ii in self.inputs]
+        return np.array([self._vals[ii] for ii in self.outputs]), jacobian
+
+    def value_and_grad(self, x):
+        """
+        Returns the value and the gradient at x of a function with a single output
+        """
+        if len(self.outputs) != 1:
+            raise ValueError('value_and_grad needs a function with a single output, use jacobian instead')
+        values, jacobian = self.jacobian(x)
+        return values[0], jacobian[0]
+
+    def save(self, path):
+        """
+        Writes the trace to a binary file that load memory-maps, the layout is described above load
+        ---------
+        :param path: the file to write
+        ---------
+        """
+        header = {'version': _FILE_VERSION, 'op_names': list(OP_NAMES), 'inputs': self.inputs,
+                  'outputs': self.outputs, 'names': self.names, 'output_names': self.output_names, 'arrays': {}}
+        blocks = []
+        offset = 0
+        for name, dtype in _FILE_ARRAYS:
+            data = np.asarray(getattr(self, name), dtype=dtype).tobytes()
+            header['arrays'][name] = [offset, len(data) // np.dtype(dtype).itemsize, dtype]
+            blocks.append(data + bytes(_aligned(len(data)) - len(data)))
+            offset += _aligned(len(data))
+        text = json.dumps(header).encode()
+        prefix = _FILE_MAGIC + np.array([len(text)], dtype='<u8').tobytes()
+        with open(path, 'wb') as f:
+            f.write(prefix + text + bytes(_aligned(len(prefix) + len(text)) - len(prefix) - len(text)))
+            for block in blocks:
+                f.write(block)
+
+
+"""
+File layout of CompiledFunction.save: the magic bytes, the length of the header as a little endian uint64,
+the JSON header (version, op names, input and output indices and names, and the offset, length and dtype of
+every array), then the raw little endian arrays, each one starting on a 64 byte boundary.
+"""
+_FILE_MAGIC = b'ADG4TAPE'
+_FILE_VERSION = 1
+_FILE_ARRAYS = (('ops', '<i1'), ('arg0', '<i8'), ('arg1', '<i8'), ('consts', '<f8'))
+_FILE_ALIGN = 64
+
+
+def _aligned(n):
+    return -(-n // _FILE_ALIGN) * _FILE_ALIGN
+
+
+def load(path, mmap=True):
+    """
+    Reads a CompiledFunction written by CompiledFunction.save
+    ---------------
+    path: the file to read
+    mmap: if True, the op arrays are memory-mapped read-only instead of read into memory, so processes
+          loading the same file share its pages and loading does not depend on its size
+    ---------------
+    return: a CompiledFunction instance
+    ---------------
+    Example:
+    rosen = tp.load('rosen.adg4')
+    val, grad = rosen.value_and_grad([0.5, 0.3])
+    """
+    with open(path, 'rb') as f:
+        prefix = f.read(len(_FILE_MAGIC) + 8)
+        if prefix[:len(_FILE_MAGIC)] != _FILE_MAGIC:
+            raise ValueError(f'{path} is not a file written by CompiledFunction.save')
+        size = int(np.frombuffer(prefix[len(_FILE_MAGIC):], dtype='<u8')[0])
+        header = json.loads(f.read(size))
+    if header['version'] != _FILE_VERSION or tuple(header['op_names']) != OP_NAMES:
+        raise ValueError(f'{path} was written by an incompatible version of ADG4')
+    start = _aligned(len(prefix) + size)
+    data = np.memmap(path, dtype=np.uint8, mode='r') if mmap else np.fromfile(path, dtype=np.uint8)
+    arrays = {}
+    for name, (offset, length, dtype) in header['arrays'].items():
+        dtype = np.dtype(dtype)
+        view = data[start + offset:start + offset + length * dtype.itemsize].view(dtype)
+        # replaying needs native byte order, big endian machines pay for a copy
+        arrays[name] = view if sys.byteorder == 'little' else view.astype(dtype.newbyteorder('='))
+    return CompiledFunction(arrays['ops'], arrays['arg0'], arrays['arg1'], arrays['consts'], header['inputs'],
+                            header['outputs'], header['names'], header['output_names'])
+
+
+def trace(f, x0, names=None, output_names=None):
+    """
+    Records f once at the inputs x0 and returns a CompiledFunction that can be replayed at new inputs
+    ---------------
+    f: a function taking one TapeVar per input and returning a TapeVar or a list of them
+    x0: a list of input values used for the trace
+    names: optional list of input names
+    output_names: optional list of output names
+    ---------------
+    return: a CompiledFunction instance
+    ---------------
+    Example:
+    rosen = tp.trace(lambda x, y: (1 - x)**2 + 100*(y - x**2)**2, [0., 0.])
+    val, grad = rosen.value_and_grad([0.5, 0.3])
+    """
+    tape = Tape()
+    x = [tape.var(value, name) for value, name in zip(x0, names if names is not None else [None] * len(x0))]
+    out = f(*x)
+    single = not isinstance(out, (list, tuple))
+    outputs = [out] if single else list(out)
+    outputs = [ii if isinstance(ii, TapeVar) else tape.const(ii) for ii in outputs]
+    return CompiledFunction(tape.ops, tape.arg0, tape.arg1, tape.consts, tape.inputs,
+                            [ii.idx for ii in outputs], tape.names, output_names)
+
+
+"""
+Below is a set of elementary functions for TapeVar. The calculation of them are self-evident.
+-----------
+Input: If not particularly specified, should be a TapeVar instance
+-----------
+Return: return a new TapeVar instance after the calculation
+"""
+def sin_tp(x):
+    return x.tape._apply(_SIN, x.idx)
+
+def cos_tp(x):
+    return x.tape._apply(_COS, x.idx)
+
+def tan_tp(x):
+    return x.tape._apply(_TAN, x.idx)
+
+def arcsin_tp(x):
+    return x.tape._apply(_ARCSIN, x.idx)
+
+def arccos_tp(x):
+    return x.tape._apply(_ARCCOS, x.idx)
+
+def arctan_tp(x):
+    return x.tape._apply(_ARCTAN, x.idx)
+
+def expa_tp(a, x):
+    """
+    Input `a` should be a scaler variable such as a int or float. `a` is an arbitrary base for the calculation.
+    """
+    return a ** x
+
+def exp_tp(x):
+    return x.tape._apply(_EXP, x.idx)
+
+def loga_tp(a, x):
+    """
+    Input `a` should be a scaler variable such as a int or float. `a` is an arbitrary base for the calculation.
+    """
+    return log_tp(x) * (1. / math.log(a))
+
+def log_tp(x):
+    return x.tape._apply(_LOG, x.idx)
+
+def sinh_tp(x):
+    return x.tape._apply(_SINH, x.idx)
+
+def cosh_tp(x):
+    return x.tape._apply(_COSH, x.idx)
+
+def tanh_tp(x):
+    return x.tape._apply(_TANH, x.idx)
+
+def logistic_tp(x):
+    """
+    We define logistic function as 1/(1+exp(-x))
+    """
+    return x.tape._apply(_LOGISTIC, x.idx)
+
+def sqrt_tp(x):
+    return x.tape._apply(_SQRT, x.idx)
@@ -0,0 +1,60 @@
+"""
+Per-operation timing of forward mode AutoDiffVector arithmetic.
+
+Every operator and elementary function is timed on a scalar variable and on a
+variable created by gen_vars, next to the cost of a single copy.deepcopy of the
+same operand, which is what every operation paid before results were built
+directly from the new val/der.
+
+Usage:
+    python benchmarks/bench_forward_ops.py [--number N]
+"""
+import argparse
+import copy
+import timeit
+
+import numpy as np
+
+import ADG4.ad as ad
+
+
+OPERATIONS = {
+    'x + y': lambda x, y: x + y,
+    'x + 2': lambda x, y: x + 2.,
+    'x - y': lambda x, y: x - y,
+    'x * y': lambda x, y: x * y,
+    '2 * x': lambda x, y: 2. * x,
+    'x / y': lambda x, y: x / y,
+    '2 / x': lambda x, y: 2. / x,
+    '-x': lambda x, y: -x,
+    'x ** 2': lambda x, y: x ** 2,
+    'x ** y': lambda x, y: x ** y,
+    'sin_ad(x)': lambda x, y: ad.sin_ad(x),
+    'exp_ad(x)': lambda x, y: ad.exp_ad(x),
+    'log_ad(x)': lambda x, y: ad.log_ad(x),
+    'tanh_ad(x)': lambda x, y: ad.tanh_ad(x),
+}
+
+
+def time_per_call(func, number):
+    """
+    Best of three runs, in microseconds per call
+    """
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1e6
+
+
+def run(number):
+    inputs = {
+        'scalar': (ad.AutoDiffVector(0.7), ad.AutoDiffVector(1.3)),
+        'gen_vars(10)': tuple(ad.gen_vars(np.linspace(0.5, 1.5, 10))[:2]),
+    }
+    for label, (x, y) in inputs.items():
+        print(f'{label}: deepcopy of one operand {time_per_call(lambda: copy.deepcopy(x), number):.2f} us')
+        for name, op in OPERATIONS.items():
+            print(f'    {name:<12} {time_per_call(lambda: op(x, y), number):.2f} us')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--number', type=int, default=20000)
+    run(parser.parse_args().number)
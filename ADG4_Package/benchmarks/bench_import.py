@@ -0,0 +1,53 @@
+"""
+Import time of the ADG4 modules, each one imported in a fresh interpreter.
+
+For every module the best of several runs is reported, next to the time of importing numpy
+alone, which every module needs. pandas is only imported when a DataFrame output is asked for,
+so the report also checks that importing a module does not load it.
+
+Usage:
+    python benchmarks/bench_import.py [--repeat N] [--budget SECONDS]
+
+With --budget the exit status is 1 when a module takes longer than the budget or loads pandas.
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+MODULES = ['numpy', 'ADG4.ad', 'ADG4.reverse', 'ADG4.tape', 'ADG4.sparsity', 'ADG4.checkpoint',
+           'ADG4.functions', 'ADG4.jacobian']
+
+PROBE = ('import sys, time, json; t = time.perf_counter(); import {module}; '
+         'print(json.dumps([time.perf_counter() - t, "pandas" in sys.modules]))')
+
+
+def import_time(module, repeat=5):
+    """
+    Returns (best seconds, True if pandas got loaded) of importing module in a fresh interpreter
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', PROBE.format(module=module)],
+                             stdout=subprocess.PIPE, universal_newlines=True, check=True).stdout
+        seconds, pandas_loaded = json.loads(out)
+        best = min(best, seconds)
+    return best, pandas_loaded
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget', type=float, help='seconds allowed per module')
+    args = parser.parse_args()
+    failures = 0
+    for module in MODULES:
+        seconds, pandas_loaded = import_time(module, args.repeat)
+        flag = ''
+        if pandas_loaded:
+            flag = '  <-- loads pandas'
+        elif args.budget is not None and seconds > args.budget:
+            flag = '  <-- over budget'
+        failures += bool(flag)
+        print(f'{module:<16} {seconds * 1e3:8.1f} ms{flag}')
+    sys.exit(1 if args.budget is not None and failures else 0)
@@ -0,0 +1,58 @@
+"""
+Per-primitive timing of the fused kernels of ADG4/kernels.py on large arrays.
+
+Every kernel is timed next to the separate value and derivative expressions the elementary
+functions evaluated before the kernels existed, e.g. tanh' as (cosh^2 - sinh^2) / cosh^2.
+The last columns time the forward mode function (batched AutoDiffVector) and the reverse mode
+node construction (TensorReverse) that use the kernel.
+
+Usage:
+    python benchmarks/bench_kernels.py [--size N] [--number N]
+"""
+import argparse
+import timeit
+
+import numpy as np
+
+import ADG4.ad as ad
+import ADG4.kernels as kn
+import ADG4.reverse as rev
+
+
+UNFUSED = {
+    'sin': lambda x: (np.sin(x), np.cos(x)),
+    'cos': lambda x: (np.cos(x), -np.sin(x)),
+    'tan': lambda x: (np.sin(x) / np.cos(x), np.power(1. / np.cos(x), 2.)),
+    'arcsin': lambda x: (np.arcsin(x), 1 / (1 - x ** 2) ** 0.5),
+    'arccos': lambda x: (np.arccos(x), -1 / (1 - x ** 2) ** 0.5),
+    'arctan': lambda x: (np.arctan(x), 1 / (1 + x ** 2)),
+    'exp': lambda x: (np.exp(x), np.exp(x)),
+    'log': lambda x: (np.log(x), 1 / x),
+    'sinh': lambda x: (np.sinh(x), np.cosh(x)),
+    'cosh': lambda x: (np.cosh(x), np.sinh(x)),
+    'tanh': lambda x: (np.tanh(x), (np.cosh(x) ** 2 - np.sinh(x) ** 2) / (np.cosh(x) ** 2)),
+    'logistic': lambda x: (1 / (1 + np.exp(-x)), np.exp(x) / (1 + np.exp(x)) ** 2),
+}
+
+
+def best(func, number):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size', type=int, default=1000000)
+    parser.add_argument('--number', type=int, default=10)
+    args = parser.parse_args()
+    # inside the domain of every primitive, arcsin and log included
+    values = np.linspace(0.01, 0.99, args.size)
+    [x] = ad.gen_batch_vars([values])
+    xr = rev.TensorReverse(values)
+    print(f'{"primitive":<10} {"unfused":>10} {"kernel":>10} {"speedup":>8} {"forward":>10} {"reverse":>10}   (ms, {args.size} points)')
+    for name, kernel in kn.KERNELS.items():
+        unfused = best(lambda: UNFUSED[name](values), args.number)
+        fused = best(lambda: kernel(values), args.number)
+        forward = best(lambda: getattr(ad, name + '_ad')(x), args.number)
+        reverse = best(lambda: getattr(rev, name + '_rv')(xr), args.number)
+        print(f'{name:<10} {unfused * 1e3:10.2f} {fused * 1e3:10.2f} {unfused / fused:7.2f}x '
+              f'{forward * 1e3:10.2f} {reverse * 1e3:10.2f}')
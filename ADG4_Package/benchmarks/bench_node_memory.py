@@ -0,0 +1,101 @@
+"""
+Memory per node of the reverse mode graph, the forward mode variables and the tape.
+
+A chain f = sin(f) * f + 0.5 of the given depth is built and kept alive while tracemalloc
+measures the memory it holds. The result is divided by the number of nodes, so it counts
+the node object itself together with its value, its children and their edge values.
+
+For comparison, the same graph is built from DictNode, a node laid out like AutoDiffReverse
+was before it got __slots__: a per-instance __dict__, a list of [node, edge] lists for the
+children, and an empty partials dict, a name and a flag on every node.
+
+Usage:
+    python benchmarks/bench_node_memory.py [--depth N]
+"""
+import argparse
+import sys
+import tracemalloc
+
+import numpy as np
+
+import ADG4.ad as ad
+import ADG4.reverse as rev
+import ADG4.tape as tp
+
+
+class DictNode():
+    def __init__(self, val, children):
+        self.val = val
+        self.children = children
+        self.has_backpropped = False
+        self.name = None
+        self._partial = {}
+
+
+def chain_dict(depth):
+    f = DictNode(0.5, [])
+    for _ in range(depth):
+        s = DictNode(np.sin(f.val), [[f, np.cos(f.val)]])
+        m = DictNode(s.val * f.val, [[s, f.val], [f, s.val]])
+        f = DictNode(m.val + 0.5, [[m, 1]])
+    return f, 3 * depth + 1
+
+
+def chain_reverse(depth):
+    x = rev.AutoDiffReverse(0.5, name='x')
+    f = x
+    for _ in range(depth):
+        f = rev.sin_rv(f) * f + 0.5
+    return f, 3 * depth + 1
+
+
+def chain_forward(depth):
+    # forward mode drops its intermediates, they are kept in a list to measure them
+    f = ad.AutoDiffVector(0.5)
+    kept = [f]
+    for _ in range(depth):
+        s = ad.sin_ad(f)
+        m = s * f
+        f = m + 0.5
+        kept += [s, m, f]
+    return kept, len(kept)
+
+
+def chain_tape(depth):
+    tape = tp.Tape()
+    f = tape.var(0.5, name='x')
+    kept = [f]
+    for _ in range(depth):
+        s = tp.sin_tp(f)
+        m = s * f
+        f = m + 0.5
+        kept += [s, m, f]
+    return (tape, kept), len(kept)
+
+
+CASES = {
+    'reverse (dict layout)': chain_dict,
+    'reverse (AutoDiffReverse)': chain_reverse,
+    'forward (AutoDiffVector)': chain_forward,
+    'tape (Tape + TapeVar)': chain_tape,
+}
+
+
+def bytes_per_node(build, depth):
+    tracemalloc.start()
+    graph, nodes = build(depth)
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del graph
+    return held / nodes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--depth', type=int, default=100000)
+    args = parser.parse_args()
+    print(f'instance size: AutoDiffReverse {sys.getsizeof(rev.AutoDiffReverse(0.5))} B, '
+          f'AutoDiffVector {sys.getsizeof(ad.AutoDiffVector(0.5))} B, '
+          f'dict layout {sys.getsizeof(DictNode(0.5, [])) + sys.getsizeof(DictNode(0.5, []).__dict__)} B')
+    for name, build in CASES.items():
+        print(f'{name:<28} {bytes_per_node(build, args.depth):8.1f} bytes per node')
@@ -0,0 +1,216 @@
+"""
+Scaling benchmarks for forward mode (AutoDiffVector) and reverse mode (AutoDiffReverse).
+
+Each benchmark sweeps one size parameter and records, for every mode:
+    seconds     best wall clock time of the whole evaluation, graph construction and derivatives
+    peak_bytes  peak memory allocated by Python during one evaluation (tracemalloc)
+
+The sweeps are
+    depth      a chain f = sin(f) * f + f of the given length, one input
+    reuse      a chain whose every layer feeds its result three times into the next one
+    fanout     one input feeding the given number of independent branches that are summed
+    inputs     sum of x[i] * x[i+1] over n inputs created with gen_vars, full gradient
+    outputs    the given number of outputs over 10 inputs, full Jacobian through vconvert
+    batch      one expression evaluated at the given number of points with gen_batch_vars
+
+Results are written as JSON so runs of different versions can be compared.
+
+Usage:
+    python benchmarks/suite.py [--quick] [--only depth,inputs] [--output results.json]
+    python benchmarks/suite.py --compare old.json new.json [--threshold 1.2]
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import timeit
+import tracemalloc
+
+import numpy as np
+
+import ADG4.ad as ad
+import ADG4.reverse as rev
+
+
+def chain_forward(depth):
+    x = ad.AutoDiffVector(0.5)
+    f = x
+    for _ in range(depth):
+        f = ad.sin_ad(f) * f + f
+    return f.der
+
+
+def chain_reverse(depth):
+    x = rev.AutoDiffReverse(0.5, name='x')
+    f = x
+    for _ in range(depth):
+        f = rev.sin_rv(f) * f + f
+    return f.partial(x)
+
+
+def reuse_forward(depth):
+    x = ad.AutoDiffVector(0.5)
+    f = x
+    for _ in range(depth):
+        f = 0.5 * f * f + 0.5 * f - 0.25 * f
+    return f.der
+
+
+def reuse_reverse(depth):
+    x = rev.AutoDiffReverse(0.5, name='x')
+    f = x
+    for _ in range(depth):
+        f = 0.5 * f * f + 0.5 * f - 0.25 * f
+    return f.partial(x)
+
+
+def fanout_forward(width):
+    x = ad.AutoDiffVector(0.5)
+    f = 0
+    for kk in range(width):
+        f = f + ad.sin_ad(x * kk)
+    return f.der
+
+
+def fanout_reverse(width):
+    x = rev.AutoDiffReverse(0.5, name='x')
+    f = 0
+    for kk in range(width):
+        f = f + rev.sin_rv(x * kk)
+    return f.partial(x)
+
+
+def inputs_forward(n, sparse=False):
+    x = ad.gen_vars(np.linspace(0.5, 1.5, n), sparse=sparse)
+    f = 0
+    for ii in range(n - 1):
+        f = f + x[ii] * x[ii + 1]
+    return ad._dense(f.der)
+
+
+def inputs_reverse(n):
+    x = [rev.AutoDiffReverse(value, name=str(ii)) for ii, value in enumerate(np.linspace(0.5, 1.5, n))]
+    f = 0
+    for ii in range(n - 1):
+        f = f + x[ii] * x[ii + 1]
+    return rev.AutoDiffReverse.jacobian([f], wrt=x)[0]
+
+
+def outputs_forward(m):
+    x = ad.gen_vars(np.linspace(0.5, 1.5, 10))
+    return ad.AutoDiffVector.vconvert([ad.sin_ad(x[kk % 10]) * x[(kk + 1) % 10] for kk in range(m)]).der
+
+
+def outputs_reverse(m):
+    x = [rev.AutoDiffReverse(value, name=str(ii)) for ii, value in enumerate(np.linspace(0.5, 1.5, 10))]
+    return rev.AutoDiffReverse.vconvert([rev.sin_rv(x[kk % 10]) * x[(kk + 1) % 10] for kk in range(m)]).der
+
+
+def batch_forward(points):
+    [x, y] = ad.gen_batch_vars([np.linspace(0.1, 1., points), np.linspace(1.5, 2.5, points)])
+    return (ad.exp_ad(x * y) / ad.log_ad(y) + ad.sin_ad(x) * y).der
+
+
+def batch_forward_loop(points):
+    ders = []
+    for xx, yy in zip(np.linspace(0.1, 1., points), np.linspace(1.5, 2.5, points)):
+        [x, y] = ad.gen_vars([xx, yy])
+        ders.append((ad.exp_ad(x * y) / ad.log_ad(y) + ad.sin_ad(x) * y).der)
+    return ders
+
+
+BENCHMARKS = {
+    'depth': ([10, 100, 1000], [10, 100, 1000, 5000],
+              {'forward': chain_forward, 'reverse': chain_reverse}),
+    'reuse': ([10, 100, 1000], [10, 100, 1000, 5000],
+              {'forward': reuse_forward, 'reverse': reuse_reverse}),
+    'fanout': ([10, 100, 1000], [10, 100, 1000, 10000],
+               {'forward': fanout_forward, 'reverse': fanout_reverse}),
+    'inputs': ([10, 100, 500], [10, 100, 1000, 3000],
+               {'forward': inputs_forward, 'forward_sparse': lambda n: inputs_forward(n, sparse=True),
+                'reverse': inputs_reverse}),
+    'outputs': ([10, 100, 500], [10, 100, 1000, 3000],
+                {'forward': outputs_forward, 'reverse': outputs_reverse}),
+    'batch': ([10, 100, 1000], [10, 1000, 100000],
+              {'forward_batch': batch_forward, 'forward_loop': batch_forward_loop}),
+}
+
+# per-point loops get slow quickly, they are only run up to this size
+MAX_SIZE = {'forward_loop': 1000}
+
+
+def measure(func, size, repeat):
+    """
+    Returns (best seconds, peak traced bytes) of func(size)
+    """
+    number = 1
+    seconds = min(timeit.repeat(lambda: func(size), number=number, repeat=repeat))
+    tracemalloc.start()
+    func(size)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def run(names, quick, repeat):
+    results = []
+    for name in names:
+        quick_sizes, full_sizes, modes = BENCHMARKS[name]
+        for size in quick_sizes if quick else full_sizes:
+            for mode, func in modes.items():
+                if size > MAX_SIZE.get(mode, size):
+                    continue
+                seconds, peak = measure(func, size, repeat)
+                results.append({'benchmark': name, 'mode': mode, 'size': size,
+                                'seconds': seconds, 'peak_bytes': peak})
+                print(f'{name:<8} {mode:<15} {size:>7} {seconds * 1e3:10.2f} ms {peak / 2 ** 20:10.2f} MiB')
+    return results
+
+
+def metadata():
+    try:
+        from importlib.metadata import version
+        adg4_version = version('ADG4')
+    except Exception:
+        adg4_version = 'unknown'
+    return {'adg4': adg4_version, 'python': platform.python_version(), 'numpy': np.__version__,
+            'platform': platform.platform(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def compare(old_path, new_path, threshold):
+    """
+    Prints the time and memory ratios new/old of every case present in both files and
+    returns the number of cases slower than threshold
+    """
+    with open(old_path) as f:
+        old = {(r['benchmark'], r['mode'], r['size']): r for r in json.load(f)['results']}
+    with open(new_path) as f:
+        new = {(r['benchmark'], r['mode'], r['size']): r for r in json.load(f)['results']}
+    regressions = 0
+    for key in sorted(set(old) & set(new)):
+        time_ratio = new[key]['seconds'] / old[key]['seconds']
+        memory_ratio = new[key]['peak_bytes'] / max(old[key]['peak_bytes'], 1)
+        flag = ''
+        if time_ratio > threshold:
+            flag = '  <-- slower'
+            regressions += 1
+        print(f'{key[0]:<8} {key[1]:<15} {key[2]:>7} time x{time_ratio:6.2f} memory x{memory_ratio:6.2f}{flag}')
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--quick', action='store_true', help='small sizes only')
+    parser.add_argument('--only', default=','.join(BENCHMARKS), help='comma separated benchmark names')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'))
+    parser.add_argument('--threshold', type=float, default=1.2, help='time ratio reported as a regression')
+    args = parser.parse_args()
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+    results = run(args.only.split(','), args.quick, args.repeat)
+    with open(args.output, 'w') as f:
+        json.dump({'meta': metadata(), 'results': results}, f, indent=1)
+    print(f'saved {len(results)} results to {args.output}')
@@ -0,0 +1,39 @@
+"""
+Tests module checkpoint.py against a reverse sweep over the full graph of the loop.
+"""
+
+import pytest
+import ADG4.checkpoint as cp
+import ADG4.reverse as rev
+import numpy as np
+
+
+def step(theta, omega):
+    return [theta + 0.01 * omega, omega - 0.01 * rev.sin_rv(theta) - 0.001 * omega * omega]
+
+
+def full_graph(x0, n_steps):
+    x = [rev.AutoDiffReverse(value) for value in x0]
+    state = x
+    for _ in range(n_steps):
+        state = step(*state)
+    return x, state
+
+
+@pytest.mark.parametrize('max_checkpoints', [None, 1, 7, 300])
+def test_checkpointed_vjp(max_checkpoints):
+    x, state = full_graph([1., 0.5], 300)
+    u = [0.3, -2.]
+    final, prod = cp.checkpointed_vjp(step, [1., 0.5], 300, u, max_checkpoints=max_checkpoints)
+    assert np.allclose(final, [ii.val for ii in state])
+    expected = [u[0] * state[0].partial(xx) + u[1] * state[1].partial(xx) for xx in x]
+    assert np.allclose(prod, expected)
+
+
+def test_checkpointed_gradient():
+    x, state = full_graph([1., 0.5], 250)
+    loss = state[0] ** 2 + rev.sin_rv(state[1])
+    value, grad = cp.checkpointed_gradient(step, [1., 0.5], 250, lambda a, b: a ** 2 + rev.sin_rv(b),
+                                           max_checkpoints=10)
+    assert np.isclose(value, loss.val)
+    assert np.allclose(grad, [loss.partial(xx) for xx in x])
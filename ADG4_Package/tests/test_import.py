@@ -0,0 +1,29 @@
+"""
+Tests that importing the package stays cheap: no pandas, no global side effects, and a fixed time budget.
+"""
+
+import json
+import subprocess
+import sys
+
+# seconds for importing every module in a fresh interpreter, numpy included
+IMPORT_BUDGET = 2.
+
+
+def test_import():
+    probe = ('import sys, time, json; limit = sys.getrecursionlimit(); t = time.perf_counter(); '
+             'import ADG4.ad, ADG4.reverse, ADG4.tape, ADG4.sparsity, ADG4.checkpoint, ADG4.functions, ADG4.jacobian; '
+             'print(json.dumps([time.perf_counter() - t, "pandas" in sys.modules, sys.getrecursionlimit() == limit]))')
+    out = subprocess.run([sys.executable, '-c', probe], stdout=subprocess.PIPE, universal_newlines=True, check=True).stdout
+    seconds, pandas_loaded, same_limit = json.loads(out)
+    assert not pandas_loaded
+    assert same_limit
+    assert seconds < IMPORT_BUDGET
+
+
+def test_frame_output_still_available():
+    import ADG4.reverse as rev
+    x = rev.AutoDiffReverse(2., name='x')
+    f = x * x
+    assert f.der['x'][0] == 4.
+    assert list(rev.AutoDiffReverse.jacobian([f], as_frame=True).columns) == ['x']
@@ -0,0 +1,67 @@
+"""
+Tests modules functions.py and jacobian.py, both modes must give the same Jacobian.
+"""
+
+import pytest
+import ADG4.ad as ad
+import ADG4.reverse as rev
+import ADG4.tape as tp
+import ADG4.functions as fn
+from ADG4.jacobian import jacobian, choose_mode
+import numpy as np
+
+
+def f(x, y, z):
+    return [fn.sin(x) * y + fn.cos(z), fn.exp(x * y) / fn.log(z), fn.tanh(x) - fn.logistic(y) + fn.sqrt(z),
+            fn.expa(2, x) * fn.loga(3, z), fn.arctan(x) + fn.arcsin(x / 4) - fn.arccos(y / 4), 5.]
+
+
+def test_dispatch():
+    assert isinstance(fn.sin(ad.AutoDiffVector(0.5)), ad.AutoDiffVector)
+    assert isinstance(fn.sin(ad.AutoDiffTaylor(0.5, order=3)), ad.AutoDiffTaylor)
+    assert isinstance(fn.sin(rev.AutoDiffReverse(0.5)), rev.AutoDiffReverse)
+    assert isinstance(fn.sin(tp.Tape().var(0.5)), tp.TapeVar)
+    assert fn.sin(0.5) == np.sin(0.5)
+    assert np.array_equal(fn.loga(2, np.array([2., 8.])), [1., 3.])
+    assert fn.sin.__name__ == 'sin'
+
+
+def test_modes_agree():
+    x = [0.5, 1.5, 2.5]
+    val_f, jac_f = jacobian(f, x, mode='forward')
+    val_r, jac_r = jacobian(f, x, mode='reverse')
+    assert jac_f.shape == (6, 3)
+    assert np.allclose(val_f, val_r) and np.allclose(jac_f, jac_r)
+    assert np.array_equal(jac_f[5], np.zeros(3))
+    assert np.isclose(jac_f[0, 0], np.cos(0.5) * 1.5)
+    val_a, jac_a = jacobian(f, x)
+    assert np.allclose(jac_a, jac_f)
+
+
+def test_choose_mode():
+    assert choose_mode(3, 6) == 'forward'
+    assert choose_mode(100, 1) == 'reverse'
+    g = lambda *x: sum(xx ** 2 for xx in x)
+    val, jac = jacobian(g, list(range(10)), n_outputs=1)
+    assert jac.shape == (1, 10) and np.array_equal(jac[0], 2 * np.arange(10))
+    with pytest.raises(ValueError):
+        jacobian(g, [1.], mode='sideways')
+
+
+def test_parallel():
+    x = [0.5, 1.5, 2.5]
+    val, jac = jacobian(f, x, mode='forward')
+    for mode in ['forward', 'reverse']:
+        val_t, jac_t = jacobian(f, x, mode=mode, n_jobs=2, executor='thread')
+        assert np.allclose(val_t, val) and np.allclose(jac_t, jac)
+        val_c, jac_c = jacobian(f, x, mode=mode, chunk_size=1)
+        assert np.allclose(jac_c, jac)
+    val_p, jac_p = jacobian(f, x, mode='reverse', n_jobs=2, executor='process', chunk_size=4)
+    assert np.allclose(val_p, val) and np.allclose(jac_p, jac)
+    with pytest.raises(ValueError):
+        jacobian(f, x, mode='forward', n_jobs=2, executor='cluster')
+    for n_jobs, chunk_size in [(0, None), (-2, None), (1.5, None), (2, 0), (1, -1)]:
+        with pytest.raises(ValueError):
+            jacobian(f, x, mode='forward', n_jobs=n_jobs, chunk_size=chunk_size)
+        with pytest.raises(ValueError):
+            jacobian(f, x, mode='reverse', n_jobs=n_jobs, chunk_size=chunk_size)
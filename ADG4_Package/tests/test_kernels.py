@@ -0,0 +1,32 @@
+"""
+Tests module kernels.py, the fused value and derivative of every elementary function.
+"""
+
+import ADG4.kernels as kn
+import ADG4.ad as ad
+import ADG4.reverse as rev
+import numpy as np
+
+
+def test_kernels():
+    x = np.linspace(0.1, 0.9, 50)
+    h = 1e-6
+    for name, kernel in kn.KERNELS.items():
+        val, der = kernel(x)
+        assert val.shape == der.shape == x.shape
+        assert np.allclose(der, (kernel(x + h)[0] - kernel(x - h)[0]) / (2 * h), rtol=1e-6), name
+    assert np.array_equal(kn.tanh(x)[0], np.tanh(x))
+    assert np.allclose(kn.expa(2., x)[1], 2. ** x * np.log(2.))
+    assert np.allclose(kn.loga(10., x)[0], np.log10(x))
+    # far in the tails the logistic derivative stays finite
+    with np.errstate(over='ignore'):
+        assert np.all(np.isfinite(kn.logistic(np.array([-800., 800.]))[1]))
+
+
+def test_single_nodes():
+    x = rev.AutoDiffReverse(0.4, name='x')
+    for func in [rev.tan_rv, rev.exp_rv, rev.log_rv, rev.logistic_rv]:
+        f = func(x)
+        assert len(rev._topological_order([f])) == 2
+        g = getattr(ad, func.__name__[:-3] + '_ad')(ad.AutoDiffVector(0.4))
+        assert np.isclose(f.val, g.val) and np.isclose(f.partial(x), g.der)
@@ -0,0 +1,58 @@
+"""
+Tests module profiler.py, the instrumentation of reverse mode graphs.
+"""
+
+import json
+import tracemalloc
+import ADG4.reverse as rev
+from ADG4.profiler import profile
+import numpy as np
+
+
+def test_profile():
+    with profile(trace_memory=True) as p:
+        x = rev.AutoDiffReverse(0.5, name='x')
+        y = rev.AutoDiffReverse(1.5, name='y')
+        f = rev.sin_rv(x * y) * x - y
+        grad = f.der
+    assert np.isclose(grad['x'][0], np.cos(0.75) * 0.75 + np.sin(0.75))
+    assert p.op_nodes == {'mul': 2, 'sin': 1, 'neg': 1, 'add': 1}
+    assert p.graph == {'nodes': 7, 'edges': 8, 'leaves': 2, 'max_fan_in': 2, 'max_fan_out': 2}
+    assert p.sweeps == 1 and p.node_visits == 7 and p.edge_visits == 8
+    assert set(p.seconds) == {'forward', 'topological_order', 'backprop', 'der'}
+    assert p.peak_bytes > 0
+    data = json.loads(p.to_json())
+    assert data['ops']['mul']['nodes'] == 2 and data['graph']['nodes'] == 7
+    assert 'largest graph' in p.report()
+    # nothing is recorded outside the block
+    rev.sin_rv(x)
+    assert p.op_nodes['sin'] == 1 and rev._profiler is None
+
+
+def test_profile_nested_sections():
+    x = rev.AutoDiffReverse(0.5, name='x')
+    with profile() as p, rev.hash_consing():
+        f = [rev.exp_rv(x) * rev.exp_rv(x), rev.exp_rv(x) + 1]
+        rev.AutoDiffReverse.vconvert(f)
+    assert p.cse_hits == 2 and p.op_nodes['exp'] == 1
+    assert {'vconvert', 'jacobian', 'topological_order', 'backprop'} <= set(p.seconds)
+    assert p.sweeps == 1 and p.peak_bytes is None
+
+
+def test_profile_inside_running_trace(monkeypatch):
+    tracemalloc.start()
+    try:
+        held = np.ones(2 ** 17)
+        with profile(trace_memory=True) as p:
+            x = rev.AutoDiffReverse(0.5, name='x')
+            (rev.sin_rv(x) * x).der
+        # the memory held before the block is not counted
+        assert 0 < p.peak_bytes < held.nbytes
+        # Python < 3.9 has no tracemalloc.reset_peak
+        monkeypatch.delattr(tracemalloc, 'reset_peak', raising=False)
+        with profile(trace_memory=True) as p:
+            (rev.sin_rv(x) * x).der
+        assert p.peak_bytes >= 0
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
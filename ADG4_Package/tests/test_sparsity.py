@@ -0,0 +1,94 @@
+"""
+Tests module sparsity.py, sparsity detection, column coloring and compressed Jacobians and Hessians.
+"""
+
+import pytest
+import ADG4.ad as ad
+import ADG4.reverse as rev
+import ADG4.sparsity as sp
+import numpy as np
+
+
+def residual(*u):
+    n = len(u)
+    return [u[ii - 1] - 2 * u[ii] + u[(ii + 1) % n] + ad.sin_ad(u[ii]) * u[ii] for ii in range(n)]
+
+
+def test_sparsity_pattern():
+    pattern = sp.jacobian_sparsity(lambda x, y, z: [x * y, ad.exp_ad(z), 2., x * 0], [1., 2., 3.])
+    assert pattern.shape == (4, 3)
+    assert np.array_equal(pattern.toarray(), [[True, True, False], [False, False, True],
+                                              [False, False, False], [True, False, False]])
+
+
+def test_coloring():
+    pattern = sp.jacobian_sparsity(residual, np.ones(30))
+    colors = sp.color_columns(pattern)
+    assert colors.max() + 1 == 3
+    dense = pattern.toarray()
+    for color in range(3):
+        # columns sharing a color never share a row
+        assert dense[:, colors == color].sum(axis=1).max() <= 1
+
+
+def test_sparse_jacobian():
+    x = np.linspace(0.1, 1., 200)
+    vals, jac = sp.sparse_jacobian(residual, x)
+    full = ad.AutoDiffVector.vconvert(residual(*ad.gen_vars(x)))
+    assert np.allclose(vals, full.val[:, 0])
+    assert jac.nnz == 600
+    assert np.allclose(jac.toarray(), full.der)
+    # reusing the pattern and the coloring at a new point
+    pattern = sp.jacobian_sparsity(residual, x)
+    vals, jac2 = sp.sparse_jacobian(residual, x + 1, pattern, sp.color_columns(pattern))
+    full = ad.AutoDiffVector.vconvert(residual(*ad.gen_vars(x + 1)))
+    assert np.allclose(jac2.toarray(), full.der)
+
+
+def test_tocsr():
+    scipy_sparse = pytest.importorskip('scipy.sparse')
+    vals, jac = sp.sparse_jacobian(residual, np.linspace(0.1, 1., 20))
+    assert isinstance(jac.tocsr(), scipy_sparse.csr_matrix)
+    assert np.allclose(jac.tocsr().toarray(), jac.toarray())
+
+
+def energy(*u):
+    # a chain coupling neighbours, plus an arrowhead coupling u[0] with every input
+    n = len(u)
+    chain = sum(rev.sin_rv(u[ii]) * u[ii + 1] + u[ii] ** 2 / (u[ii + 1] + 3) for ii in range(n - 1))
+    return chain + sum(rev.exp_rv(u[0] * u[ii]) for ii in range(1, n))
+
+
+def test_star_coloring():
+    pattern = sp.hessian_sparsity(lambda *u: sum(rev.exp_rv(u[0] * ii) for ii in u), np.ones(30))
+    assert np.array_equal(pattern.toarray(), pattern.toarray().T)
+    # an arrowhead needs a color per column without symmetry, and two with it
+    assert sp.color_columns(pattern).max() + 1 == 30
+    assert sp.star_color(pattern).max() + 1 == 2
+    pattern = sp.hessian_sparsity(energy, np.ones(40))
+    colors = sp.star_color(pattern)
+    dense = pattern.toarray()
+    adjacent = dense & ~np.eye(40, dtype=bool)
+    assert not np.any(adjacent & (colors[:, None] == colors[None, :]))
+    # every path through four columns uses at least three colors
+    for ww, xx in zip(*np.nonzero(adjacent)):
+        for vv in np.flatnonzero(adjacent[ww]):
+            for yy in np.flatnonzero(adjacent[xx]):
+                if len({vv, ww, xx, yy}) == 4:
+                    assert len({colors[vv], colors[ww], colors[xx], colors[yy]}) >= 3
+
+
+def test_sparse_hessian():
+    x = np.linspace(0.1, 1., 40)
+    val, grad, hess = sp.sparse_hessian(energy, x)
+    val_true, grad_true, hess_true = rev.hessian(energy, x)
+    assert np.isclose(val, val_true)
+    assert np.allclose(grad, grad_true)
+    assert np.allclose(hess.toarray(), hess_true)
+    # reusing the pattern and the coloring at a new point
+    pattern = sp.hessian_sparsity(energy, x)
+    val, grad, hess = sp.sparse_hessian(energy, x + 1, pattern, sp.star_color(pattern))
+    assert np.allclose(hess.toarray(), rev.hessian(energy, x + 1)[2])
+    # an output that does not depend on the inputs
+    val, grad, hess = sp.sparse_hessian(lambda x, y: 3., [1., 2.])
+    assert val == 3. and np.array_equal(grad, [0., 0.]) and hess.nnz == 0 and hess.shape == (2, 2)